@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+from .db import mongo
+from .neighbors import from_document
+from .place_index import NEIGHBOR_LISTS_KEY, PlaceIndex
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# How often each node checks whether another node changed the catalog
+CATALOG_POLL_SECONDS = float(os.getenv("CATALOG_POLL_SECONDS", "10"))
+
+CATALOG_VERSION_ID = "catalog_version"
+
+
+class Catalog:
+    """In-process copy of the destinations, indexed per location.
+
+    Every write to ``destinations`` must go through :meth:`bump`, which
+    increments the version document in Mongo. Nodes poll that document and
+    reload their copy when it no longer matches the version they loaded.
+    """
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        self._indexes: Dict[str, PlaceIndex] = {}
+        self._load_lock = asyncio.Lock()
+
+    async def read_version(self) -> int:
+        doc = await mongo.meta.find_one({"_id": CATALOG_VERSION_ID}, {"version": 1})
+        return doc["version"] if doc else 0
+
+    async def load(self):
+        async with self._load_lock:
+            await self._load()
+
+    async def _load(self):
+        # Read the version first: a write racing with the load bumps it
+        # again and the next poll reloads
+        version = await self.read_version()
+
+        places = defaultdict(list)
+        async for place in mongo.destinations.find({}, {"_id": 0}):
+            places[place.get("location")].append(place)
+
+        neighbors = defaultdict(dict)
+        async for doc in mongo.neighbors.find(self._neighbors_query()):
+            neighbors[doc["location"]][doc["id"]] = from_document(doc)
+
+        self._indexes = {
+            location: self._index(location, items, neighbors.get(location))
+            for location, items in places.items()
+        }
+        self.version = version
+
+    @staticmethod
+    def _index(location: str, places: list, neighbors: Optional[dict]) -> PlaceIndex:
+        index = PlaceIndex(places, neighbors)
+        if index.skipped:
+            logger.warning(
+                "Skipped %d malformed destinations in %r: ids %s",
+                len(index.skipped), location, [place.get("id") for place in index.skipped],
+            )
+        return index
+
+    @staticmethod
+    def _neighbors_query(location: Optional[str] = None) -> dict:
+        # Lists built for another bucket table are stale
+        query = {"key": NEIGHBOR_LISTS_KEY}
+        if location is not None:
+            query["location"] = location
+        return query
+
+    async def poll(self):
+        if await self.read_version() != self.version:
+            await self.load()
+
+    async def poll_forever(self, interval: float = CATALOG_POLL_SECONDS):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.poll()
+            except PyMongoError as exc:
+                # Keep serving the loaded copy until Mongo is reachable again
+                logger.warning("Catalog poll failed: %s", exc)
+            except Exception:
+                # Anything else must not end the poller for the process
+                logger.exception("Catalog reload failed")
+
+    @staticmethod
+    async def bump_version() -> int:
+        """Increment the version without reloading, for processes that
+        write to ``destinations`` but don't serve the catalog."""
+        doc = await mongo.meta.find_one_and_update(
+            {"_id": CATALOG_VERSION_ID},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return doc["version"]
+
+    async def bump(self, location: Optional[str] = None) -> int:
+        version = await self.bump_version()
+
+        if location is None or self.version is None or version != self.version + 1:
+            # Bulk write, or another node wrote in between: reload everything
+            await self.load()
+            return version
+
+        places = await mongo.destinations.find(
+            {"location": location}, {"_id": 0}
+        ).to_list(length=None)
+        neighbors = {
+            doc["id"]: from_document(doc)
+            async for doc in mongo.neighbors.find(self._neighbors_query(location))
+        }
+        self._indexes[location] = self._index(location, places, neighbors)
+        self.version = version
+
+        return version
+
+    async def get(self, location: str) -> Optional[PlaceIndex]:
+        if self.version is None:
+            async with self._load_lock:
+                # Requests that queued behind another load share its result
+                if self.version is None:
+                    await self._load()
+
+        index = self._indexes.get(location)
+        return index if index else None
+
+
+catalog = Catalog()
@@ -0,0 +1,72 @@
+import math
+from typing import Sequence
+
+import numpy as np
+
+
+def _project(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    # Equirectangular around the mean latitude, good enough within a city
+    scale = math.cos(math.radians(float(lats.mean())))
+    return np.column_stack((lons * scale, lats))
+
+
+def _balanced_assign(distances: np.ndarray, capacity: int) -> np.ndarray:
+    # Closest (point, cluster) pairs first, skipping clusters that are full
+    n, k = distances.shape
+    labels = np.full(n, -1)
+    room = np.full(k, capacity)
+
+    for flat in np.argsort(distances, axis=None, kind="stable"):
+        point, cluster = divmod(int(flat), k)
+        if labels[point] == -1 and room[cluster] > 0:
+            labels[point] = cluster
+            room[cluster] -= 1
+
+    return labels
+
+
+def balanced_kmeans(
+    lats: Sequence[float],
+    lons: Sequence[float],
+    k: int,
+    max_iterations: int = 20,
+    seed: int = 0,
+) -> np.ndarray:
+    """Cluster points into ``k`` groups of at most ``ceil(n / k)`` points.
+
+    Lloyd iterations where the assignment step fills clusters greedily by
+    distance under the size cap. Seeded k-means++ start, so the same input
+    always gives the same clusters. Returns a cluster label per point.
+    """
+    points = _project(np.asarray(lats, dtype=float), np.asarray(lons, dtype=float))
+    n = len(points)
+    k = min(k, n)
+    if k <= 1:
+        return np.zeros(n, dtype=int)
+
+    rng = np.random.default_rng(seed)
+    centres = [points[rng.integers(n)]]
+    for _ in range(k - 1):
+        nearest = np.min(
+            ((points[:, None, :] - np.asarray(centres)[None, :, :]) ** 2).sum(axis=2), axis=1
+        )
+        total = nearest.sum()
+        pick = rng.choice(n, p=nearest / total) if total > 0 else rng.integers(n)
+        centres.append(points[pick])
+    centres = np.asarray(centres)
+
+    capacity = math.ceil(n / k)
+    labels = None
+    for _ in range(max_iterations):
+        distances = np.sqrt(((points[:, None, :] - centres[None, :, :]) ** 2).sum(axis=2))
+        new_labels = _balanced_assign(distances, capacity)
+        if labels is not None and np.array_equal(labels, new_labels):
+            break
+
+        labels = new_labels
+        for cluster in range(k):
+            members = points[labels == cluster]
+            if len(members):
+                centres[cluster] = members.mean(axis=0)
+
+    return labels
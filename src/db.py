@@ -1,12 +1,91 @@
+import logging
 import os
+from typing import Optional
 
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
+from pymongo import ASCENDING, IndexModel
 
 load_dotenv()
 
-client = MongoClient(os.getenv("MONGO_URI"))
-db = client["Travlapes"]
+logger = logging.getLogger(__name__)
 
-users = db["users"]
-destinations = db["destinations"]
+MONGO_URI = os.getenv("MONGO_URI")
+MONGO_DB_NAME = "Travlapes"
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+
+
+class Mongo:
+    """Async Mongo access shared by every route.
+
+    The client is opened in the app lifespan (or lazily on first use) so it
+    binds to the running event loop.
+    """
+
+    client: Optional[AsyncIOMotorClient] = None
+
+    def connect(self):
+        if self.client is None:
+            self.client = AsyncIOMotorClient(
+                MONGO_URI,
+                maxPoolSize=MONGO_MAX_POOL_SIZE,
+                minPoolSize=MONGO_MIN_POOL_SIZE,
+            )
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+
+    def collection(self, name: str) -> AsyncIOMotorCollection:
+        self.connect()
+        return self.client[MONGO_DB_NAME][name]
+
+    async def ensure_indexes(self):
+        # Idempotent, Mongo skips indexes that already exist
+        indexes = {
+            "destinations": [
+                # Sparse: imported city data may have no ids at all, and a
+                # plain unique index counts every missing id as a duplicate null
+                IndexModel([("id", ASCENDING)], unique=True, sparse=True),
+                IndexModel([("location", ASCENDING), ("category", ASCENDING)]),
+                IndexModel([("compatable_moods", ASCENDING)]),
+            ],
+            "neighbors": [
+                IndexModel([("id", ASCENDING)], unique=True),
+                IndexModel([("location", ASCENDING)]),
+            ],
+            "users": [
+                IndexModel([("username", ASCENDING)], unique=True),
+            ],
+        }
+
+        # One collection failing (bad data, an option conflict with an
+        # existing index) must not leave the others without theirs.
+        # Missing indexes only cost speed and uniqueness checks, so the
+        # error is logged and the app keeps serving.
+        for name, models in indexes.items():
+            try:
+                await self.collection(name).create_indexes(models)
+            except Exception:
+                logger.exception("Creating indexes on %s failed", name)
+
+    @property
+    def users(self) -> AsyncIOMotorCollection:
+        return self.collection("users")
+
+    @property
+    def destinations(self) -> AsyncIOMotorCollection:
+        return self.collection("destinations")
+
+    @property
+    def neighbors(self) -> AsyncIOMotorCollection:
+        return self.collection("neighbors")
+
+    @property
+    def meta(self) -> AsyncIOMotorCollection:
+        return self.collection("meta")
+
+
+mongo = Mongo()
@@ -0,0 +1,37 @@
+import hashlib
+import json
+from typing import Optional
+
+from fastapi import Request, Response
+
+from .catalog import catalog
+
+
+def catalog_etag(*params) -> Optional[str]:
+    """Strong ETag for a response that only depends on the catalog and
+    ``params``; ``None`` until the catalog version is known.
+
+    Other nodes learn about writes by polling, so their ETags can lag a
+    write by up to CATALOG_POLL_SECONDS.
+    """
+    if catalog.version is None:
+        return None
+
+    payload = json.dumps([catalog.version, *params], sort_keys=True, default=str)
+    return '"' + hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def not_modified(request: Request, etag: Optional[str]) -> Optional[Response]:
+    # The 304 to send back when the client already holds this ETag
+    if etag is None:
+        return None
+
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    if "*" in tags or etag in tags:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    return None
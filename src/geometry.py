@@ -0,0 +1,76 @@
+import math
+from typing import List, Sequence
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000
+
+
+def encode_polyline(coordinates: Sequence[Sequence[float]], precision: int = 5) -> str:
+    """Encode GeoJSON ordered ``[lon, lat]`` points as a Google polyline.
+
+    ``precision`` is 5 for the classic format and 6 for OSRM's polyline6.
+    """
+    factor = 10 ** precision
+    encoded = []
+    prev_lat = prev_lon = 0
+
+    for lon, lat, *_ in coordinates:
+        lat = int(math.floor(lat * factor + 0.5))
+        lon = int(math.floor(lon * factor + 0.5))
+
+        for delta in (lat - prev_lat, lon - prev_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                encoded.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            encoded.append(chr(value + 63))
+
+        prev_lat, prev_lon = lat, lon
+
+    return "".join(encoded)
+
+
+def simplify(coordinates: Sequence[Sequence[float]], tolerance_m: float) -> List:
+    """Douglas-Peucker simplification of ``[lon, lat]`` points.
+
+    Distances are measured on a local equirectangular projection, which is
+    accurate to well under a percent at city scale.
+    """
+    if tolerance_m <= 0 or len(coordinates) < 3:
+        return list(coordinates)
+
+    points = np.asarray([c[:2] for c in coordinates], dtype=float)
+    lat0 = math.radians(points[:, 1].mean())
+    x = np.radians(points[:, 0]) * EARTH_RADIUS_M * math.cos(lat0)
+    y = np.radians(points[:, 1]) * EARTH_RADIUS_M
+
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+
+    # Iterative to stay clear of the recursion limit on long routes
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        px, py = x[start + 1:end] - x[start], y[start + 1:end] - y[start]
+        length_sq = dx * dx + dy * dy
+
+        if length_sq == 0:
+            distances = np.hypot(px, py)
+        else:
+            # Distance to the segment, not the infinite line
+            t = np.clip((px * dx + py * dy) / length_sq, 0, 1)
+            distances = np.hypot(px - t * dx, py - t * dy)
+
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance_m:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+
+    return [coordinates[i] for i in np.flatnonzero(keep)]
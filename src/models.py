@@ -1,7 +1,7 @@
 from enum import Enum
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 # "food", "entertainment", "culture", "peaceful", "adventurous", "nature"
 # "sunny", "rainy", "cloudy"
@@ -24,6 +24,7 @@ class Weather(str, Enum):
 
 
 class Season(str, Enum):
+    spring = "spring"
     summer = "summer"
     winter = "winter"
     autumn = "autumn"
@@ -70,6 +71,7 @@ class DestinationFilter(BaseModel):
     location: Optional[str] = None
     category: Optional[List[str]] = None
     moods: Optional[List[str]] = None
+    fields: Optional[List[str]] = None
 
 
 class Token(BaseModel):
@@ -87,6 +89,39 @@ class RecommendationRequest(BaseModel):
     to_date: str
     moods: List[Mood]
     budget: float
+    limit: Optional[int] = Field(None, ge=1)
+    view: Literal["full", "compact"] = "full"
+
+
+class RecommendationBatchRequest(BaseModel):
+    requests: List[RecommendationRequest]
+
+
+class Coordinate(BaseModel):
+    latitude: float
+    longitude: float
+
+
+class RouteMatrixRequest(BaseModel):
+    profile: str
+    coordinates: Optional[List[Coordinate]] = None
+    destination_ids: Optional[List[int]] = None
+
+
+class Stop(Coordinate):
+    id: Optional[int] = None
+
+
+class ItineraryDay(BaseModel):
+    primary_attraction: List[Stop] = []
+    secondary_attraction: List[Stop] = []
+    visit_order: Optional[List[int]] = None
+
+
+class ItineraryRequest(BaseModel):
+    profile: str
+    stops: Optional[List[Stop]] = None
+    days: Optional[Dict[str, ItineraryDay]] = None
 
 
 class FinalizedPlacesRequest(BaseModel):
@@ -96,6 +131,10 @@ class FinalizedPlacesRequest(BaseModel):
     accomodations: List[DestinationCreate]
     from_date: str
     to_date:str
+    optimize_order: bool = False
+    max_per_day: Optional[int] = Field(None, ge=1)
+    cluster_days: bool = False
+    profile: str = "car"
 
 
 MOOD_TO_CATEGORY = {
@@ -0,0 +1,184 @@
+import asyncio
+import os
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from pymongo import ReplaceOne
+
+from .db import mongo
+from .place_index import (
+    CATEGORY_CODES,
+    NEIGHBOR_BUCKETS,
+    NEIGHBOR_LISTS_KEY,
+    NEIGHBOR_RADIUS_KM,
+    NO_CATEGORY,
+    PRIMARY_CATEGORIES,
+    category_code,
+)
+from .spatial_index import SpatialGrid, haversine_batch
+
+load_dotenv()
+
+# Longest list kept per bucket. Places with more neighbors than this are
+# stored without a list and the recommender checks distances for them.
+NEIGHBOR_LIST_MAX = int(os.getenv("NEIGHBOR_LIST_MAX", "256"))
+
+BucketLists = Dict[str, Optional[List[int]]]
+
+_PROJECTION = {"_id": 0, "id": 1, "location": 1, "category": 1, "latitude": 1, "longitude": 1}
+
+
+def _category_table(categories) -> np.ndarray:
+    # Lookup by category code (NO_CATEGORY included) of membership in ``categories``
+    table = np.zeros(NO_CATEGORY + 1, dtype=bool)
+    table[[CATEGORY_CODES[category] for category in categories]] = True
+    return table
+
+
+_BUCKET_TABLES = {
+    bucket: (radius_km, _category_table(categories))
+    for bucket, (radius_km, categories) in NEIGHBOR_BUCKETS.items()
+}
+_PRIMARY_TABLE = _category_table(PRIMARY_CATEGORIES)
+
+
+def _code(place: dict) -> int:
+    return category_code(place.get("category"))
+
+
+def _bucket_lists(ids: np.ndarray, codes: np.ndarray, distances: np.ndarray) -> BucketLists:
+    # Ids of the places each bucket would keep around a primary attraction,
+    # None once a list outgrows NEIGHBOR_LIST_MAX
+    lists = {}
+    for bucket, (radius_km, table) in _BUCKET_TABLES.items():
+        near = ids[(distances <= radius_km) & table[codes]]
+        lists[bucket] = near.tolist() if len(near) <= NEIGHBOR_LIST_MAX else None
+    return lists
+
+
+def compute_neighbors(places: Iterable[dict]) -> Dict[int, BucketLists]:
+    """Bucket lists of every place of a location that can be a primary
+    attraction, keyed by place id."""
+    places = [
+        place for place in places
+        if place.get("id") is not None and _code(place) != NO_CATEGORY
+    ]
+    if not places:
+        return {}
+
+    ids = np.array([place["id"] for place in places])
+    codes = np.array([_code(place) for place in places])
+
+    grid = SpatialGrid.from_places(places, cell_km=NEIGHBOR_RADIUS_KM)
+    primary = np.flatnonzero(_PRIMARY_TABLE[codes]).tolist()
+    matches = grid.query(
+        (float(places[i]["latitude"]) for i in primary),
+        (float(places[i]["longitude"]) for i in primary),
+        NEIGHBOR_RADIUS_KM,
+    )
+
+    neighbors = {}
+    for i, (positions, distances) in zip(primary, matches):
+        others = positions != i
+        positions, distances = positions[others], distances[others]
+        neighbors[places[i]["id"]] = _bucket_lists(
+            ids[positions], codes[positions], distances
+        )
+
+    return neighbors
+
+
+def _document(place_id: int, location: str, lists: BucketLists) -> dict:
+    return {"id": place_id, "location": location, "key": NEIGHBOR_LISTS_KEY, "buckets": lists}
+
+
+def from_document(doc: dict) -> BucketLists:
+    return doc.get("buckets", {})
+
+
+async def refresh_location(location: str):
+    """Recompute and store the neighbor lists of every place in ``location``."""
+    places = await mongo.destinations.find(
+        {"location": location}, _PROJECTION
+    ).to_list(length=None)
+    neighbors = compute_neighbors(places)
+
+    await mongo.neighbors.delete_many(
+        {"location": location, "id": {"$nin": list(neighbors)}}
+    )
+    if neighbors:
+        await mongo.neighbors.bulk_write([
+            ReplaceOne({"id": place_id}, _document(place_id, location, lists), upsert=True)
+            for place_id, lists in neighbors.items()
+        ], ordered=False)
+
+
+async def add_place(place: dict):
+    """Store the lists of a newly inserted place and add it to the lists of
+    the places around it.
+
+    Lists that grow past NEIGHBOR_LIST_MAX are dropped; places without
+    lists fall back to distance checks until the next full refresh.
+    """
+    location = place["location"]
+    code = _code(place)
+
+    others = [
+        other for other in await mongo.destinations.find(
+            {"location": location, "id": {"$ne": place["id"]}}, _PROJECTION
+        ).to_list(length=None)
+        if other.get("id") is not None and _code(other) != NO_CATEGORY
+    ]
+    distances = haversine_batch(
+        float(place["latitude"]), float(place["longitude"]),
+        np.array([float(other["latitude"]) for other in others]),
+        np.array([float(other["longitude"]) for other in others]),
+    )
+    ids = np.array([other["id"] for other in others], dtype=np.int64)
+    codes = np.array([_code(other) for other in others], dtype=np.int64)
+
+    if _PRIMARY_TABLE[code]:
+        await mongo.neighbors.replace_one(
+            {"id": place["id"]},
+            _document(place["id"], location, _bucket_lists(ids, codes, distances)),
+            upsert=True,
+        )
+
+    for bucket, (radius_km, table) in _BUCKET_TABLES.items():
+        if not table[code]:
+            continue
+
+        near = ids[(distances <= radius_km) & _PRIMARY_TABLE[codes]]
+        if not len(near):
+            continue
+
+        field = f"buckets.{bucket}"
+        await mongo.neighbors.update_many(
+            {"id": {"$in": near.tolist()}, "key": NEIGHBOR_LISTS_KEY, field: {"$type": "array"}},
+            {"$push": {field: place["id"]}},
+        )
+        # Element NEIGHBOR_LIST_MAX exists once a list is over the cap
+        await mongo.neighbors.update_many(
+            {"location": location, f"{field}.{NEIGHBOR_LIST_MAX}": {"$exists": True}},
+            {"$set": {field: None}},
+        )
+
+
+async def refresh_all():
+    for location in await mongo.destinations.distinct("location"):
+        await refresh_location(location)
+
+
+async def main():
+    # Ingest step: rebuild every list, then let every node reload
+    from .catalog import catalog
+
+    await mongo.ensure_indexes()
+    await refresh_all()
+    await catalog.bump_version()
+    mongo.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
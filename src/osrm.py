@@ -0,0 +1,182 @@
+import os
+from typing import Dict, List, Tuple
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+from .cache import LRUCache
+
+load_dotenv()
+
+OSRM_SERVICES = {
+    "car": "http://localhost:5001",
+    "bike": "http://localhost:5002",
+    "foot": "http://localhost:5003",
+}
+
+OSRM_PROFILE_MAP = {
+    "car": "driving",
+    "bike": "cycling",
+    "foot": "foot",
+}
+
+OSRM_MAX_CONNECTIONS = int(os.getenv("OSRM_MAX_CONNECTIONS", "100"))
+OSRM_MAX_KEEPALIVE = int(os.getenv("OSRM_MAX_KEEPALIVE", "20"))
+OSRM_KEEPALIVE_EXPIRY = float(os.getenv("OSRM_KEEPALIVE_EXPIRY", "30"))
+OSRM_CONNECT_TIMEOUT = float(os.getenv("OSRM_CONNECT_TIMEOUT", "5"))
+OSRM_READ_TIMEOUT = float(os.getenv("OSRM_READ_TIMEOUT", "30"))
+OSRM_WRITE_TIMEOUT = float(os.getenv("OSRM_WRITE_TIMEOUT", "5"))
+OSRM_POOL_TIMEOUT = float(os.getenv("OSRM_POOL_TIMEOUT", "5"))
+
+# Decimal places coordinates are rounded to before routing (4 is ~11m)
+ROUTE_CACHE_PRECISION = int(os.getenv("ROUTE_CACHE_PRECISION", "4"))
+ROUTE_CACHE_MAX_BYTES = int(os.getenv("ROUTE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+ROUTE_CACHE_MAX_ENTRIES = int(os.getenv("ROUTE_CACHE_MAX_ENTRIES", "100000"))
+
+# Must not exceed the --max-table-size the OSRM containers run with
+OSRM_MAX_TABLE_SIZE = int(os.getenv("OSRM_MAX_TABLE_SIZE", "100"))
+
+
+class OsrmClients:
+    """One long-lived, keep-alive httpx client per OSRM profile.
+
+    Opened in the app lifespan; ``get`` opens them lazily otherwise.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def open(self):
+        limits = httpx.Limits(
+            max_connections=OSRM_MAX_CONNECTIONS,
+            max_keepalive_connections=OSRM_MAX_KEEPALIVE,
+            keepalive_expiry=OSRM_KEEPALIVE_EXPIRY,
+        )
+        timeout = httpx.Timeout(
+            connect=OSRM_CONNECT_TIMEOUT,
+            read=OSRM_READ_TIMEOUT,
+            write=OSRM_WRITE_TIMEOUT,
+            pool=OSRM_POOL_TIMEOUT,
+        )
+
+        for profile, base_url in OSRM_SERVICES.items():
+            if profile not in self._clients:
+                self._clients[profile] = httpx.AsyncClient(
+                    base_url=base_url, limits=limits, timeout=timeout
+                )
+
+    async def close(self):
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    def get(self, profile: str) -> httpx.AsyncClient:
+        if profile not in self._clients:
+            self.open()
+
+        return self._clients[profile]
+
+
+osrm_clients = OsrmClients()
+
+
+def _route_size(route: dict) -> int:
+    # Rough in-memory footprint: a [lon, lat] list of two floats is ~120 bytes
+    return 200 + 120 * len(route["coordinates"])
+
+
+route_cache = LRUCache(
+    maxsize=ROUTE_CACHE_MAX_ENTRIES,
+    maxbytes=ROUTE_CACHE_MAX_BYTES,
+    sizeof=_route_size,
+)
+
+
+async def fetch_route(
+    profile: str,
+    start_lat: float,
+    start_lon: float,
+    end_lat: float,
+    end_lon: float,
+) -> dict:
+    if profile not in OSRM_SERVICES:
+        raise HTTPException(status_code=400, detail="Invalid profile")
+
+    # Nearby requests snap to the same points and share a cached route
+    start_lat, start_lon, end_lat, end_lon = (
+        round(value, ROUTE_CACHE_PRECISION)
+        for value in (start_lat, start_lon, end_lat, end_lon)
+    )
+    key = (profile, start_lat, start_lon, end_lat, end_lon)
+
+    route = route_cache.get(key)
+    if route is not None:
+        return route
+
+    url = (
+        f"/route/v1/{OSRM_PROFILE_MAP[profile]}/"
+        f"{start_lon},{start_lat};{end_lon},{end_lat}"
+        "?overview=full&geometries=geojson"
+    )
+    response = await osrm_clients.get(profile).get(url)
+
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=500,
+            detail=response.text
+        )
+
+    data = response.json()
+
+    if not data.get("routes"):
+        raise HTTPException(
+            status_code=404,
+            detail="No route found"
+        )
+
+    osrm_route = data["routes"][0]
+    route = {
+        "distance_m": osrm_route["distance"],
+        "duration_s": osrm_route["duration"],
+        "coordinates": osrm_route["geometry"]["coordinates"],
+    }
+
+    route_cache.set(key, route)
+    return route
+
+
+async def fetch_table(profile: str, points: List[Tuple[float, float]]) -> dict:
+    """Duration (s) and distance (m) matrices between ``(lat, lon)`` points.
+
+    Row ``i`` holds the values from point ``i`` to every point, ``None``
+    where OSRM found no route.
+    """
+    if profile not in OSRM_SERVICES:
+        raise HTTPException(status_code=400, detail="Invalid profile")
+
+    if len(points) > OSRM_MAX_TABLE_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {OSRM_MAX_TABLE_SIZE} points per matrix"
+        )
+
+    coordinates = ";".join(f"{lon},{lat}" for lat, lon in points)
+    url = (
+        f"/table/v1/{OSRM_PROFILE_MAP[profile]}/{coordinates}"
+        "?annotations=duration,distance"
+    )
+    response = await osrm_clients.get(profile).get(url)
+
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=500,
+            detail=response.text
+        )
+
+    data = response.json()
+
+    return {
+        "durations_s": data["durations"],
+        "distances_m": data["distances"],
+    }
@@ -0,0 +1,102 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+
+load_dotenv()
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_POOL_SIZE = int(os.getenv("BCRYPT_POOL_SIZE", "4"))
+# Hashes allowed to wait for a worker before new ones are turned away
+BCRYPT_MAX_QUEUE = int(os.getenv("BCRYPT_MAX_QUEUE", "32"))
+
+
+class PasswordHasher:
+    """bcrypt on its own small thread pool.
+
+    bcrypt releases the GIL, so a few dedicated threads hash in parallel
+    without touching the threadpool the rest of the app runs on. Once
+    ``pool_size + max_queue`` hashes are pending, new ones fail fast with 503.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = BCRYPT_POOL_SIZE,
+        max_queue: int = BCRYPT_MAX_QUEUE,
+        rounds: int = BCRYPT_ROUNDS,
+    ):
+        self.rounds = rounds
+        self.limit = pool_size + max_queue
+        self.pending = 0
+        self.rejected = 0
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+
+    def _timed(self, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.count += 1
+                self.total_seconds += elapsed
+                self.max_seconds = max(self.max_seconds, elapsed)
+
+    async def _run(self, fn, *args):
+        # Only touched from the event loop thread, no lock needed
+        if self.pending >= self.limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many authentication requests, try again shortly",
+                headers={"Retry-After": "1"},
+            )
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._timed, fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._run(
+            bcrypt.hashpw,
+            password.encode("utf-8"),
+            bcrypt.gensalt(rounds=self.rounds),
+        )
+        return hashed.decode("utf-8")
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(
+            bcrypt.checkpw,
+            password.encode("utf-8"),
+            hashed.encode("utf-8"),
+        )
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "rounds": self.rounds,
+            "pending": self.pending,
+            "limit": self.limit,
+            "rejected": self.rejected,
+            "hashes": self.count,
+            "avg_seconds": self.total_seconds / self.count if self.count else 0.0,
+            "max_seconds": self.max_seconds,
+        }
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,216 @@
+import itertools
+import math
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .models import Category, Mood, MOOD_COMPLEMENTARY, MOOD_TO_CATEGORY
+
+MOODS = list(Mood)
+MOOD_BITS = {mood.value: 1 << bit for bit, mood in enumerate(MOODS)}
+MOOD_MASK_TYPE = np.min_scalar_type((1 << len(MOODS)) - 1)
+
+CATEGORIES = list(Category)
+CATEGORY_CODES = {category.value: code for code, category in enumerate(CATEGORIES)}
+# Code of malformed or unknown categories, which never match a mood
+NO_CATEGORY = len(CATEGORIES)
+
+
+def _value(v):
+    # Places coming from Mongo hold plain strings, pydantic models hold enums
+    return getattr(v, "value", v)
+
+
+def category_code(category) -> int:
+    """Code of ``category`` in ``CATEGORIES``, ``NO_CATEGORY`` if unknown."""
+    category = _value(category)
+    return CATEGORY_CODES.get(category, NO_CATEGORY) if isinstance(category, str) else NO_CATEGORY
+
+
+def _number(v) -> float:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _rating(v) -> float:
+    # Unparseable or non-finite ratings would make the ranking keys
+    # unorderable; they count as no rating at all
+    rating = _number(v)
+    return rating if math.isfinite(rating) else 0.0
+
+
+def _usable(place: dict) -> bool:
+    # Places that cannot be put on a map or matched to moods are skipped
+    try:
+        return (
+            math.isfinite(float(place["latitude"]))
+            and math.isfinite(float(place["longitude"]))
+            and "category" in place
+            and isinstance(place["compatable_moods"], list)
+        )
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
+def mood_mask(moods: Iterable) -> int:
+    mask = 0
+    for mood in moods:
+        mood = _value(mood)
+        if isinstance(mood, str):
+            mask |= MOOD_BITS.get(mood, 0)
+    return mask
+
+
+# MOOD_TO_CATEGORY by category code: the moods that select each category
+CATEGORY_MOOD_MASKS = np.zeros(NO_CATEGORY + 1, dtype=MOOD_MASK_TYPE)
+for _mood, _categories in MOOD_TO_CATEGORY.items():
+    for _category in _categories:
+        CATEGORY_MOOD_MASKS[CATEGORY_CODES[_category.value]] |= MOOD_BITS[_mood.value]
+
+COMPLEMENTARY_MASKS = {
+    mood.value: mood_mask(complementary) for mood, complementary in MOOD_COMPLEMENTARY.items()
+}
+
+# Categories a primary attraction can have
+PRIMARY_CATEGORIES = {
+    category.value for categories in MOOD_TO_CATEGORY.values() for category in categories
+}
+
+# Radius each bucket is kept within around the primary attractions, and the
+# categories its places can have
+NEIGHBOR_BUCKETS = {
+    "secondary": (2.5, {
+        category.value
+        for complementary in MOOD_COMPLEMENTARY.values()
+        for mood in complementary
+        for category in MOOD_TO_CATEGORY[mood]
+    }),
+    "food": (1.5, {Category.restaurant.value}),
+    "accomodations": (2.0, {Category.accomodations.value}),
+}
+NEIGHBOR_RADIUS_KM = max(radius for radius, _ in NEIGHBOR_BUCKETS.values())
+
+# Stored neighbor lists are only valid for the bucket table they were built with
+NEIGHBOR_LISTS_KEY = ";".join(
+    f"{bucket}:{radius}:{','.join(sorted(categories))}"
+    for bucket, (radius, categories) in NEIGHBOR_BUCKETS.items()
+)
+
+
+def weight_table(weights: Dict[str, int]) -> np.ndarray:
+    """Score of every possible mood mask: the summed weights of its moods.
+
+    Indexing the table with an array of masks scores them all at once.
+    """
+    masks = np.arange(1 << len(MOODS))
+    table = np.zeros(len(masks), dtype=np.int64)
+    for mood, weight in weights.items():
+        table += weight * ((masks & MOOD_BITS[_value(mood)]) != 0)
+    return table
+
+
+def complementary_weights(moods: Iterable) -> Dict[str, int]:
+    # How many of the requested moods each complementary mood comes from
+    weights = Counter()
+    for mood in moods:
+        mask = COMPLEMENTARY_MASKS[_value(mood)]
+        weights.update(m for m, bit in MOOD_BITS.items() if mask & bit)
+    return weights
+
+
+class PlaceIndex:
+    """Columnar copy of a location's places for vectorized scoring.
+
+    Row ``i`` of every array describes ``places[i]``: coordinates, rating
+    (0 when unparseable) and price as floats, the category as a code into ``CATEGORIES`` and the
+    ``compatable_moods`` as a bitmask of ``MOOD_BITS``.
+
+    ``neighbors`` maps place ids to their precomputed lists, see
+    :mod:`src.neighbors`. They are kept per bucket in CSR form: the
+    neighbors of place ``i`` are ``neighbor_positions[bucket][ptr[i]:ptr[i + 1]]``
+    with ``ptr = neighbor_ptr[bucket]``, and ``has_neighbors[i]`` tells
+    whether place ``i`` has complete lists.
+
+    Malformed places are kept out of the columns and listed in ``skipped``.
+    """
+
+    def __init__(self, places: Iterable[dict], neighbors: Optional[dict] = None):
+        self.places: List[dict] = []
+        self.skipped: List[dict] = []
+        for place in places:
+            (self.places if _usable(place) else self.skipped).append(place)
+
+        self.ids = [place.get("id") for place in self.places]
+        self.positions = {
+            place_id: position
+            for position, place_id in enumerate(self.ids)
+            if place_id is not None
+        }
+
+        self.latitude = np.array([_number(p["latitude"]) for p in self.places], dtype=float)
+        self.longitude = np.array([_number(p["longitude"]) for p in self.places], dtype=float)
+        self.rating = np.array([_rating(p.get("rating", 0)) for p in self.places], dtype=float)
+        self.price = np.array([_number(p.get("avg_price")) for p in self.places], dtype=float)
+
+        self.category = np.array(
+            [category_code(p["category"]) for p in self.places], dtype=np.uint8
+        )
+        self.moods = np.array(
+            [mood_mask(p["compatable_moods"]) for p in self.places],
+            dtype=MOOD_MASK_TYPE,
+        )
+
+        self._neighbor_columns(neighbors or {})
+
+    def _neighbor_columns(self, neighbors: Dict[int, Dict[str, Optional[List[int]]]]):
+        complete = []
+        rows = {bucket: [] for bucket in NEIGHBOR_BUCKETS}
+
+        for place_id in self.ids:
+            lists = neighbors.get(place_id) or {}
+            # A missing or capped (None) list means the place has no fast path
+            has_lists = all(isinstance(lists.get(bucket), list) for bucket in NEIGHBOR_BUCKETS)
+            complete.append(has_lists)
+
+            for bucket in NEIGHBOR_BUCKETS:
+                rows[bucket].append([
+                    self.positions[other]
+                    for other in (lists[bucket] if has_lists else ())
+                    if other in self.positions
+                ])
+
+        self.has_neighbors = np.array(complete, dtype=bool)
+        self.neighbor_ptr: Dict[str, np.ndarray] = {}
+        self.neighbor_positions: Dict[str, np.ndarray] = {}
+        for bucket, bucket_rows in rows.items():
+            self.neighbor_ptr[bucket] = np.concatenate(
+                ([0], np.cumsum([len(row) for row in bucket_rows], dtype=np.int64))
+            ).astype(np.int64)
+            self.neighbor_positions[bucket] = np.fromiter(
+                itertools.chain.from_iterable(bucket_rows), dtype=np.int32
+            )
+
+    def neighbors_of(self, positions: np.ndarray, bucket: str) -> np.ndarray:
+        """Concatenated neighbor positions of ``positions`` in ``bucket``."""
+        ptr = self.neighbor_ptr[bucket]
+        starts = ptr[positions]
+        lengths = ptr[positions + 1] - starts
+        # Index of every element of every segment, without a Python loop
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return self.neighbor_positions[bucket][offsets + np.arange(lengths.sum())]
+
+    def score(self, table: np.ndarray) -> np.ndarray:
+        """Scores of every place for the moods that select its category."""
+        return table[self.moods & CATEGORY_MOOD_MASKS[self.category]]
+
+    def score_in(self, category: Category, table: np.ndarray) -> np.ndarray:
+        """Scores of the places of one ``category``, zero for the rest."""
+        scores = table[self.moods]
+        scores[self.category != CATEGORY_CODES[_value(category)]] = 0
+        return scores
+
+    def __len__(self):
+        return len(self.places)
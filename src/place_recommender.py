@@ -1,7 +1,22 @@
+import heapq
 import json
 import math
+from collections import Counter
 from datetime import datetime, timedelta
+
+import numpy as np
+
+from .clustering import balanced_kmeans
 from .models import *
+from .place_index import (
+  NEIGHBOR_BUCKETS,
+  NEIGHBOR_RADIUS_KM,
+  PlaceIndex,
+  complementary_weights,
+  weight_table,
+)
+from .spatial_index import SpatialGrid
+from .weather_cache import weather_cache
 from .weather_and_season import *
 
 # TODO: Make sure that each attraction have atleast 2/3 secondary attraction, food, accomodation
@@ -23,297 +38,477 @@ def haversine(lat1, lon1, lat2, lon2):
 
 
 def filter_within_radius(
-  primary_attractions,
-  other_attractions,
-  radius_km=2.0
-):
-  filtered = []
-
-  for score, place in other_attractions:
-    lat = float(place["latitude"])
-    lon = float(place["longitude"])
-
-    for _, primary in primary_attractions:
-      d = haversine(
-        lat, lon,
-        float(primary["latitude"]),
-        float(primary["longitude"])
-      )
-
-      if d <= radius_km:
-        filtered.append((score, place))
-        break  # no need to check other primaries
+  index: PlaceIndex,
+  primary_attractions: np.ndarray,
+  other_attractions: np.ndarray,
+  radius_km=2.0,
+  grid: Optional[SpatialGrid] = None
+) -> np.ndarray:
+  # Positions of other_attractions within radius_km of any primary one
+  if not len(primary_attractions) or not len(other_attractions):
+    return other_attractions[:0]
+
+  # Build the grid once per primary set and share it between calls
+  if grid is None:
+    grid = SpatialGrid(
+      index.latitude[primary_attractions],
+      index.longitude[primary_attractions],
+      cell_km=radius_km
+    )
+
+  within = grid.within(
+    index.latitude[other_attractions],
+    index.longitude[other_attractions],
+    radius_km
+  )
 
-  return filtered
+  return other_attractions[within]
 
 
-def generate_recommendations(
-  places_data: List[DestinationCreate],
-  from_date: str,
-  to_date: str,
-  moods: List[Mood],
-  budget: float
-):
-  start_date = datetime.fromisoformat(from_date)
-  end_date = datetime.fromisoformat(to_date)
-  trip_days = (end_date - start_date).days + 1
+def filter_by_neighbors(
+  index: PlaceIndex,
+  primary_attractions: np.ndarray,
+  other_attractions: np.ndarray,
+  bucket: str
+) -> np.ndarray:
+  # Same result as filter_within_radius, read off the precomputed lists:
+  # the union of the primary attractions' lists for the bucket (and the
+  # primary attractions themselves, at distance zero)
+  near = np.zeros(len(index), dtype=bool)
+  near[primary_attractions] = True
+  near[index.neighbors_of(primary_attractions, bucket)] = True
 
-  primary_attractions = []
-  secondary_attractions = []
-  food_places = []
-  accomodations = []
+  return other_attractions[near[other_attractions]]
 
-  recommended_primary_attractions = 0
-  recommended_secondary_attractions = 0
-  recommended_food_places = 0
-  recommended_accomodations = 0
 
-  # Collecting the primary attractions
-  for place in places_data:
-    score = 0
+def spend(budget, prices, allowance):
+  # Every place within the allowance is paid for, in catalog order
+  affordable = prices[prices <= allowance].tolist()
+  for price in affordable:
+    budget -= price
+  return budget, len(affordable)
 
-    for mood in moods:
-      categories = MOOD_TO_CATEGORY[mood]
 
-      if place["category"] not in categories:
-        continue
+def rank_places(index, positions, scores):
+  # Every candidate best first by score + rating, ties in catalog order
+  keys = (scores[positions] + index.rating[positions]).tolist()
+  order = sorted(range(len(positions)), key=keys.__getitem__, reverse=True)
+  return positions[order]
 
-      for comp_mood in place["compatable_moods"]:
-        if mood == comp_mood:
-          score += 1
 
-    if score > 0:
-      primary_attractions.append((score, place))
+def top_places(index, positions, scores, limit=None, view="full", ranked=None):
+  # Best first by score + rating. With a limit only the top places are
+  # selected, through a heap instead of a full sort; ties keep catalog order
+  # either way. ``ranked`` is a ranking already made by rank_places.
+  if ranked is not None:
+    positions = ranked[:limit].tolist()
+  else:
+    keys = (scores[positions] + index.rating[positions]).tolist()
+    if limit is None:
+      order = sorted(range(len(positions)), key=keys.__getitem__, reverse=True)
+    else:
+      order = heapq.nlargest(limit, range(len(positions)), key=keys.__getitem__)
+    positions = positions[order].tolist()
 
+  # Compact entries are hydrated by clients from their cached catalog
+  if view == "compact":
+    return [
+      {"id": index.ids[position], "score": int(scores[position])}
+      for position in positions
+    ]
 
-  # Remove primary attractions from the data
-  used_values = {id(v) for _, v in primary_attractions}
-  primary_attraction_removed_data = [v for v in places_data if id(v) not in used_values]
+  return [index.places[position] for position in positions]
 
 
-  # Collecting secondary Attraction
+def find_candidates(index: PlaceIndex, moods: List[Mood]) -> dict:
+  """Scored positions of every bucket for a set of moods, before budgeting.
 
-  for place in primary_attraction_removed_data:
-    score = 0
+  Only depends on the moods, so requests sharing them can share the result.
+  """
+  # Every place is scored at once: its mood bitmask, restricted to the moods
+  # that select its category, is looked up in a table of summed weights
+  mood_weights = weight_table(Counter(moods))
 
-    for mood in moods:
-      complementary_moods = MOOD_COMPLEMENTARY[mood]
+  # Collecting the primary attractions
+  primary_scores = index.score(mood_weights)
+  primary_attractions = np.flatnonzero(primary_scores)
 
-      for complementary_mood in complementary_moods:
-        categories = MOOD_TO_CATEGORY[complementary_mood]
-        if place["category"] in categories:
-          for compatable_mood in place["compatable_moods"]:
-            if complementary_mood == compatable_mood:
-              score += 1
 
-    if score > 0:
-      secondary_attractions.append((score, place))
+  # Collecting secondary Attraction, leaving out the primary attractions
+  secondary_scores = index.score(weight_table(complementary_weights(moods)))
+  secondary_scores[primary_attractions] = 0
+  secondary_attractions = np.flatnonzero(secondary_scores)
 
 
   # Collecting Food Places
-  if Mood.food not in moods:
-    for place in places_data:
-      if place["category"] != Category.restaurant:
-        continue
-
-      score = 0
-      for mood in moods:
-        for compatable_mood in place["compatable_moods"]:
-          if mood == compatable_mood:
-            score += 1
-
-      if score > 0:
-        food_places.append((score, place))
+  food_scores = index.score_in(Category.restaurant, mood_weights)
+  if Mood.food in moods:
+    food_scores[:] = 0
+  food_places = np.flatnonzero(food_scores)
 
 
   # Collecting accomodations
-  for place in places_data:
-    if place["category"] != Category.accomodations:
-      continue
+  accomodation_scores = index.score_in(Category.accomodations, mood_weights)
+  accomodations = np.flatnonzero(accomodation_scores)
 
-    score = 0
-    for mood in moods:
-      for compatable_mood in place["compatable_moods"]:
-        if mood == compatable_mood:
-          score += 1
 
-    if score > 0:
-      accomodations.append((score, place))
+  # Remove the places that are too far away, from the precomputed neighbor
+  # lists when every primary attraction has them
+  if index.has_neighbors[primary_attractions].all():
+    near = lambda others, bucket: filter_by_neighbors(
+      index, primary_attractions, others, bucket
+    )
+  else:
+    primary_grid = SpatialGrid(
+      index.latitude[primary_attractions],
+      index.longitude[primary_attractions],
+      cell_km=NEIGHBOR_RADIUS_KM
+    )
+    near = lambda others, bucket: filter_within_radius(
+      index, primary_attractions, others, NEIGHBOR_BUCKETS[bucket][0], grid=primary_grid
+    )
 
+  return {
+    "primary": (primary_attractions, primary_scores),
+    "secondary": (near(secondary_attractions, "secondary"), secondary_scores),
+    "food": (near(food_places, "food"), food_scores),
+    "accomodations": (near(accomodations, "accomodations"), accomodation_scores),
+  }
 
-  # Remove the places that are too far away
-  secondary_attractions = filter_within_radius(
-    primary_attractions,
-    secondary_attractions,
-    radius_km=2.5
-  )
-  food_places = filter_within_radius(
-    primary_attractions,
-    food_places,
-    radius_km=1.5
-  )
-  accomodations = filter_within_radius(
-    primary_attractions,
-    accomodations,
-    radius_km=2.0
-  )
 
-  # Sort according to score + rating
-  primary_attractions = sorted(
-    primary_attractions,
-    key=lambda x: x[0] + float(x[1].get("rating", 0)),
-    reverse=True
-  )
-  secondary_attractions = sorted(
-    secondary_attractions,
-    key=lambda x: x[0] + float(x[1].get("rating", 0)),
-    reverse=True
-  )
-  food_places = sorted(
-    food_places,
-    key=lambda x: x[0] + float(x[1].get("rating", 0)),
-    reverse=True
-  )
-  accomodations = sorted(
-    accomodations,
-    key=lambda x: x[0] + float(x[1].get("rating", 0)),
-    reverse=True
-  )
+def recommend_within_budget(
+  index: PlaceIndex,
+  candidates: dict,
+  trip_days: int,
+  budget: float,
+  limit: Optional[int] = None,
+  view: str = "full",
+  ranked: Optional[dict] = None
+):
+  primary_attractions, primary_scores = candidates["primary"]
+  secondary_attractions, secondary_scores = candidates["secondary"]
+  food_places, food_scores = candidates["food"]
+  accomodations, accomodation_scores = candidates["accomodations"]
+  ranked = ranked or {}
 
   # No accomodations needed for a 1 day trip
 
   budget_for_accomodation = budget * 0.3
+  recommended_accomodations = 0
 
   if trip_days <= 1:
-    accomodations = []
+    accomodations = accomodations[:0]
+    ranked = {**ranked, "accomodations": accomodations}
   else:
-    for (score, place) in accomodations:
-      if budget_for_accomodation >= place["avg_price"] * (trip_days - 1):
-        budget -= place["avg_price"] * (trip_days - 1)
-        recommended_accomodations += 1
-        break
+    # The best ranked accomodation that fits the budget
+    stay_prices = index.price[accomodations] * (trip_days - 1)
+    affordable = accomodations[budget_for_accomodation >= stay_prices]
+    if len(affordable):
+      keys = accomodation_scores[affordable] + index.rating[affordable]
+      best = affordable[np.argmax(keys)]
+      budget -= index.price[best] * (trip_days - 1)
+      recommended_accomodations += 1
 
   # Calculating budget for foods
-  budget_for_food = budget * 0.3
-  for (score, place) in food_places:
-    if budget_for_food >= place["avg_price"]:
-      budget -= place["avg_price"]
-      recommended_food_places += 1
+  budget, recommended_food_places = spend(
+    budget, index.price[food_places], budget * 0.3
+  )
 
   # Calculating budget for primary attraction
-  budget_for_primary_attraction = budget * 0.3
-  for (score, place) in primary_attractions:
-    if budget_for_primary_attraction >= place["avg_price"]:
-      budget -= place["avg_price"]
-      recommended_primary_attractions += 1
+  budget, recommended_primary_attractions = spend(
+    budget, index.price[primary_attractions], budget * 0.3
+  )
 
   # Calculating budget for secondary attraction
-  budget_for_secondary_attraction = budget * 0.1
-  for (score, place) in secondary_attractions:
-    if budget_for_secondary_attraction >= place["avg_price"]:
-      budget -= place["avg_price"]
-      recommended_secondary_attractions += 1
+  budget, recommended_secondary_attractions = spend(
+    budget, index.price[secondary_attractions], budget * 0.1
+  )
 
-  primary_attractions = [p for _, p in primary_attractions];
-  secondary_attractions = [p for _, p in secondary_attractions];
-  food_places = [p for _, p in food_places];
-  accomodations = [p for _, p in accomodations];
+  def data(bucket, positions, scores):
+    return top_places(index, positions, scores, limit, view, ranked.get(bucket))
 
   return {
-      "primary": { "data": primary_attractions, "recommended": recommended_primary_attractions },
-      "secondary": { "data": secondary_attractions, "recommended": recommended_secondary_attractions },
-      "food": { "data": food_places, "recommended": recommended_food_places},
-      "accomodations": { "data": accomodations, "recommended": recommended_accomodations }
+      "primary": {
+        "data": data("primary", primary_attractions, primary_scores),
+        "recommended": recommended_primary_attractions,
+        "total": len(primary_attractions)
+      },
+      "secondary": {
+        "data": data("secondary", secondary_attractions, secondary_scores),
+        "recommended": recommended_secondary_attractions,
+        "total": len(secondary_attractions)
+      },
+      "food": {
+        "data": data("food", food_places, food_scores),
+        "recommended": recommended_food_places,
+        "total": len(food_places)
+      },
+      "accomodations": {
+        "data": data("accomodations", accomodations, accomodation_scores),
+        "recommended": recommended_accomodations,
+        "total": len(accomodations)
+      }
   }
 
 
-def distribute_places_into_days(
-  primary_attractions: List[DestinationCreate],
-  secondary_attractions: List[DestinationCreate],
-  food_places: List[DestinationCreate],
-  accomodations: List[DestinationCreate],
+def generate_recommendations(
+  places_data: List[DestinationCreate],
   from_date: str,
   to_date: str,
+  moods: List[Mood],
+  budget: float,
+  index: Optional[PlaceIndex] = None,
+  limit: Optional[int] = None,
+  view: str = "full"
 ):
   start_date = datetime.fromisoformat(from_date)
   end_date = datetime.fromisoformat(to_date)
   trip_days = (end_date - start_date).days + 1
 
-  # prepare empty days
-  trip_places_per_day = {
-      i+1: {
-        "primary_attraction": [],
-        "secondary_attraction": [],
-        "food_places": food_places,
-        "accomodations": accomodations,
-      }
-      for i in range(trip_days)
-  }
+  if index is None:
+    index = PlaceIndex(places_data)
 
-  # Filter using season and weather
-  season_in_trip = []
-  weather_in_trip = []
+  return recommend_within_budget(
+    index, find_candidates(index, moods), trip_days, budget, limit, view
+  )
 
-  current = start_date
-  while current <= end_date:
-    date_str = current.date().strftime("%Y-%m-%d")
 
-    # Get each day season
-    season_in_trip.append(get_season(date_str))
+def generate_batch_recommendations(index: PlaceIndex, requests: List[dict]):
+  """Recommendations for many requests over one location, in request order.
 
-    # Get weather for each day for each data points
-    for place in primary_attractions:
-      key = f'{place["latitude"]},{place["longitude"]}'
-      weather = get_weather_for_date(place["latitude"], place["longitude"], date_str)
-      weather_in_trip.append(weather)
-      break
+  Each request holds ``moods``, ``trip_days``, ``budget``, ``limit`` and
+  ``view``. Candidates, radius filters and rankings are computed once per
+  distinct set of moods; only the budget passes run per request.
+  """
+  shared = {}
+  results = []
 
-    current += timedelta(days=1)
+  for req in requests:
+    moods = req["moods"]
+    key = tuple(sorted((mood.value, count) for mood, count in Counter(moods).items()))
 
-  # Step counter
+    if key not in shared:
+      candidates = find_candidates(index, moods)
+      ranked = {
+        bucket: rank_places(index, positions, scores)
+        for bucket, (positions, scores) in candidates.items()
+      }
+      shared[key] = (candidates, ranked)
+
+    candidates, ranked = shared[key]
+    results.append(recommend_within_budget(
+      index,
+      candidates,
+      req["trip_days"],
+      req["budget"],
+      req.get("limit"),
+      req.get("view", "full"),
+      ranked
+    ))
+
+  return results
+
+
+def schedule_places(places, suitable_days, trip_days, max_per_day=None):
+  # suitable_days[i] is a bitset of the days places[i] may be visited on.
+  # Places are dealt to the next suitable day that still has room, most
+  # constrained places first so flexible ones don't take their only days.
+  # max_per_day is a hard cap; without it an even spread is only the
+  # target, and a place whose suitable days are all full goes to the
+  # least busy of them instead of being dropped.
+  soft = max_per_day is None
+  if soft:
+    max_per_day = max(1, math.ceil(len(places) / trip_days))
+
+  assigned = [[] for _ in range(trip_days)]
+  open_days = (1 << trip_days) - 1
   day = 0
-  place_step = 0
-  place_cnt = 0
 
-  # Append primary attrations
-  while place_cnt < len(primary_attractions):
-    place_step += 1
+  for i in sorted(range(len(places)), key=lambda i: suitable_days[i].bit_count()):
+    candidates = suitable_days[i] & open_days
+    if not candidates:
+      if soft and suitable_days[i]:
+        spill = min(
+          (d for d in range(trip_days) if suitable_days[i] >> d & 1),
+          key=lambda d: len(assigned[d])
+        )
+        assigned[spill].append(i)
+      continue
 
-    place = primary_attractions[place_cnt]
-    if season_in_trip[day] in place["suitable_season"]:
-      if weather_in_trip[day] in place["suitable_weather"]:
-        trip_places_per_day[day+1]["primary_attraction"].append(place)
-        place_cnt += 1
-        place_step = 0
+    later = candidates >> day
+    if later:
+      day += (later & -later).bit_length() - 1
+    else:
+      day = (candidates & -candidates).bit_length() - 1
+
+    assigned[day].append(i)
+    if len(assigned[day]) >= max_per_day:
+      open_days &= ~(1 << day)
+
+    day = (day + 1) % trip_days
+
+  # Keep the ranking order of the input inside each day
+  return [[places[i] for i in sorted(day_places)] for day_places in assigned]
+
+
+def cluster_places(places, suitable_days, trip_days):
+  # Split the places into one tight geographic cluster per day, give each
+  # cluster the day most of its places suit, and move places that don't
+  # suit their cluster's day to the nearest cluster on a day they do suit.
+  assigned = [[] for _ in range(trip_days)]
+  if not places:
+    return assigned
+
+  lats = [float(place["latitude"]) for place in places]
+  lons = [float(place["longitude"]) for place in places]
+  labels = balanced_kmeans(lats, lons, trip_days)
+  clusters = int(labels.max()) + 1
+
+  fits = [[0] * trip_days for _ in range(clusters)]
+  for i, label in enumerate(labels):
+    for day in range(trip_days):
+      if suitable_days[i] >> day & 1:
+        fits[label][day] += 1
+
+  cluster_day = {}
+  free_days = set(range(trip_days))
+  pairs = sorted(
+    ((cluster, day) for cluster in range(clusters) for day in range(trip_days)),
+    key=lambda pair: -fits[pair[0]][pair[1]]
+  )
+  for cluster, day in pairs:
+    if cluster not in cluster_day and day in free_days:
+      cluster_day[cluster] = day
+      free_days.remove(day)
+
+  day_centres = {
+    cluster_day[cluster]: (
+      sum(lat for lat, label in zip(lats, labels) if label == cluster) / count,
+      sum(lon for lon, label in zip(lons, labels) if label == cluster) / count,
+    )
+    for cluster, count in enumerate(np.bincount(labels, minlength=clusters))
+    if count
+  }
 
-    day += 1
+  for i, label in enumerate(labels):
+    day = cluster_day[label]
+    if not suitable_days[i] >> day & 1:
+      options = [d for d in range(trip_days) if suitable_days[i] >> d & 1]
+      if not options:
+        continue
 
-    if place_step >= trip_days:
-      place_cnt += 1
+      day = min(
+        options,
+        key=lambda d: haversine(lats[i], lons[i], *day_centres[d]) if d in day_centres else math.inf
+      )
 
-    if day >= trip_days:
-      day = 0
+    assigned[day].append(i)
 
-  # Append primary attrations
-  while place_cnt < len(secondary_attractions):
-    place_step += 1
+  return [[places[i] for i in day_places] for day_places in assigned]
 
-    place = secondary_attractions[place_cnt]
-    if season_in_trip[day] in place["suitable_season"]:
-      if weather_in_trip[day] in place["suitable_weather"]:
-        trip_places_per_day[day+1]["secondary_attraction"].append(place)
-        place_cnt += 1
-        place_step = 0
 
-    day += 1
+def distribute_places_into_days(
+  primary_attractions: List[DestinationCreate],
+  secondary_attractions: List[DestinationCreate],
+  food_places: List[DestinationCreate],
+  accomodations: List[DestinationCreate],
+  from_date: str,
+  to_date: str,
+  weather_by_cell: Optional[dict] = None,
+  max_per_day: Optional[int] = None,
+  cluster_days: bool = False
+):
+  # Clusters mix primary and secondary attractions, which max_per_day
+  # caps separately
+  if cluster_days and max_per_day is not None:
+    raise ValueError("max_per_day can't be combined with cluster_days")
 
-    if place_step >= trip_days:
-      place_cnt += 1
+  start_date = datetime.fromisoformat(from_date)
+  end_date = datetime.fromisoformat(to_date)
+  trip_days = (end_date - start_date).days + 1
 
-    if day >= trip_days:
-      day = 0
+  # Filter using season and weather
+  trip_dates = [
+    (start_date + timedelta(days=i)).date().strftime("%Y-%m-%d")
+    for i in range(trip_days)
+  ]
+
+  # Days of the trip in each season, as bitsets
+  season_days = {}
+  for day, date_str in enumerate(trip_dates):
+    season = get_season(date_str).value
+    season_days[season] = season_days.get(season, 0) | (1 << day)
+
+  # Get the weather of each place, places in the same grid cell share it
+  if weather_by_cell is None:
+    weather_by_cell = {}
+    for place in [*primary_attractions, *secondary_attractions]:
+      cell = weather_cache.snap(place["latitude"], place["longitude"])
+      if cell not in weather_by_cell:
+        weather_by_cell[cell] = get_weather_for_range(*cell, trip_dates[0], trip_dates[-1])
+
+  # Days of the trip with each weather, per grid cell
+  weather_days = {}
+  for cell, weather_by_date in weather_by_cell.items():
+    weather_days[cell] = {}
+    for day, date_str in enumerate(trip_dates):
+      weather = weather_by_date[date_str].value
+      weather_days[cell][weather] = weather_days[cell].get(weather, 0) | (1 << day)
+
+  def suitable_days(place):
+    seasons = 0
+    for season in place["suitable_season"]:
+      seasons |= season_days.get(getattr(season, "value", season), 0)
+
+    cell_weather = weather_days[weather_cache.snap(place["latitude"], place["longitude"])]
+    weathers = 0
+    for weather in place["suitable_weather"]:
+      weathers |= cell_weather.get(getattr(weather, "value", weather), 0)
+
+    return seasons & weathers
+
+  if cluster_days:
+    # One geographic cluster of attractions per day
+    places = [*primary_attractions, *secondary_attractions]
+    places_per_day = cluster_places(
+      places,
+      [suitable_days(place) for place in places],
+      trip_days
+    )
+    primary_ids = {id(place) for place in primary_attractions}
+
+    return {
+        i+1: {
+          "primary_attraction": [p for p in places_per_day[i] if id(p) in primary_ids],
+          "secondary_attraction": [p for p in places_per_day[i] if id(p) not in primary_ids],
+          "food_places": food_places,
+          "accomodations": accomodations,
+        }
+        for i in range(trip_days)
+    }
+
+  primary_per_day = schedule_places(
+    primary_attractions,
+    [suitable_days(place) for place in primary_attractions],
+    trip_days,
+    max_per_day
+  )
+  secondary_per_day = schedule_places(
+    secondary_attractions,
+    [suitable_days(place) for place in secondary_attractions],
+    trip_days,
+    max_per_day
+  )
 
-  return trip_places_per_day
+  return {
+      i+1: {
+        "primary_attraction": primary_per_day[i],
+        "secondary_attraction": secondary_per_day[i],
+        "food_places": food_places,
+        "accomodations": accomodations,
+      }
+      for i in range(trip_days)
+  }
 
 
 
@@ -0,0 +1,25 @@
+from fastapi import APIRouter
+
+from ..osrm import route_cache
+from ..password_hasher import password_hasher
+from ..weather_cache import weather_cache
+from .recommend import recommendation_cache
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/stats")
+def get_stats():
+    return {
+        "password_hasher": password_hasher.stats(),
+        "weather_cache": weather_cache.stats(),
+        "route_cache": route_cache.stats(),
+        "recommendation_cache": recommendation_cache.stats(),
+    }
+
+
+@router.delete("/recommendation-cache")
+def purge_recommendation_cache():
+    purged = len(recommendation_cache)
+    recommendation_cache.clear()
+    return {"purged": purged}
@@ -1,43 +1,127 @@
-from fastapi import APIRouter, HTTPException
-
-from ..db import destinations
+import json
+import os
+from typing import Literal, Optional
+
+from bson import ObjectId, json_util
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pymongo import ASCENDING
+
+from ..catalog import catalog
+from ..db import mongo
+from ..etag import catalog_etag, not_modified
 from ..models import DestinationCreate, DestinationFilter
+from ..neighbors import add_place
 
 router = APIRouter(prefix="/destinations", tags=["destinations"])
 
+MAX_PAGE_SIZE = 1000
+
+# Lets /search?explain=true report the Mongo query plan
+DEBUG_QUERY_PLANS = os.getenv("DEBUG_QUERY_PLANS", "false").lower() in ("1", "true", "yes")
+
 
 @router.get("/")
-def list_all_destinations():
+async def list_all_destinations(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    format: Literal["json", "ndjson"] = "json",
+):
+    # Answered before touching Mongo when the client is up to date
+    etag = catalog_etag("destinations", limit, after, format)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+
+    # Keyset pagination on _id, which every document has (imported city
+    # data may have no id); pass the last _id seen as `after`
+    query = {}
+    if after is not None:
+        if not ObjectId.is_valid(after):
+            raise HTTPException(status_code=400, detail="Invalid `after` cursor")
+        query["_id"] = {"$gt": ObjectId(after)}
+
+    cursor = mongo.destinations.find(query)
+
+    if limit is not None or after is not None:
+        cursor = cursor.sort("_id", ASCENDING)
+    if limit is not None:
+        cursor = cursor.limit(limit)
+
+    if format == "ndjson":
+        return StreamingResponse(
+            stream_ndjson(cursor),
+            media_type="application/x-ndjson",
+            headers={"ETag": etag} if etag else None
+        )
+
     # Find all destinations and convert cursor to list
-    all_destinations = list(destinations.find())
+    all_destinations = await cursor.to_list(length=None)
 
     # Convert MongoDB _id to string for JSON serialization
     for dest in all_destinations:
         dest["_id"] = str(dest["_id"])
 
-    return {"status": "ok", "data": all_destinations, "count": len(all_destinations)}
+    if etag:
+        response.headers["ETag"] = etag
+
+    next_after = None
+    if limit is not None and len(all_destinations) == limit:
+        next_after = all_destinations[-1]["_id"]
+
+    return {
+        "status": "ok",
+        "data": all_destinations,
+        "count": len(all_destinations),
+        "next_after": next_after,
+    }
+
+
+async def stream_ndjson(cursor):
+    # One document per line as the cursor yields them, nothing is buffered
+    async for dest in cursor:
+        dest["_id"] = str(dest["_id"])
+        yield json.dumps(dest, default=str) + "\n"
 
 
 @router.post("/")
-def create_destination(dest: DestinationCreate):
+async def create_destination(dest: DestinationCreate):
     # Check if destination with same id already exists
-    if destinations.find_one({"id": dest.id}):
+    if await mongo.destinations.find_one({"id": dest.id}):
         raise HTTPException(
             status_code=400, detail="Destination with this ID already exists"
         )
 
     # Insert into MongoDB
-    destinations.insert_one(
+    await mongo.destinations.insert_one(
         {
             **dest.dict(),
         }
     )
 
+    # Before the bump, so the reloaded catalog sees the new lists
+    await add_place(dest.dict())
+
+    # Recommendations on every node must see the new place
+    await catalog.bump(dest.location)
+
     return {"message": "Destination added successfully"}
 
 
 @router.post("/search")
-def search_destinations(filters: DestinationFilter):
+async def search_destinations(
+    filters: DestinationFilter,
+    request: Request,
+    response: Response,
+    explain: bool = False,
+):
+    etag = None if explain else catalog_etag("search", filters.model_dump())
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+
     query = {}
     if filters.name:
         query["name"] = filters.name
@@ -51,7 +135,31 @@ def search_destinations(filters: DestinationFilter):
     if filters.moods:
         query["compatable_moods"] = {"$in": filters.moods}
 
-    results = list(destinations.find(query))
+    # Only return the requested fields, _id included only when asked for
+    projection = None
+    if filters.fields:
+        projection = {field: 1 for field in filters.fields}
+        projection.setdefault("_id", 0)
+
+    cursor = mongo.destinations.find(query, projection)
+
+    if explain:
+        if not DEBUG_QUERY_PLANS:
+            raise HTTPException(status_code=403, detail="Query plans are disabled")
+
+        plan = await cursor.explain()
+        winning_plan = json.loads(json_util.dumps(plan["queryPlanner"]["winningPlan"]))
+        return {
+            "query": query,
+            "winning_plan": winning_plan,
+            "collection_scan": "COLLSCAN" in json.dumps(winning_plan),
+        }
+
+    results = await cursor.to_list(length=None)
     for r in results:
-        r["_id"] = str(r["_id"])
+        if "_id" in r:
+            r["_id"] = str(r["_id"])
+
+    if etag:
+        response.headers["ETag"] = etag
     return results
@@ -1,25 +1,49 @@
 #osrmRoute.py
 
-from fastapi import APIRouter, HTTPException
-import httpx
+import asyncio
+import os
+from typing import List, Literal
+
+from fastapi import APIRouter, HTTPException, Query
+
+from ..db import mongo
+from ..geometry import encode_polyline, simplify
+from ..models import ItineraryDay, ItineraryRequest, RouteMatrixRequest, Stop
+from ..osrm import fetch_route, fetch_table
 
 router = APIRouter(
     prefix="/route",
     tags=["Routing"]
 )
 
-OSRM_SERVICES = {
-    "car": "http://localhost:5001",
-    "bike": "http://localhost:5002",
-    "foot": "http://localhost:5003",
-}
+# OSRM requests in flight for a single itinerary
+ITINERARY_CONCURRENCY = int(os.getenv("ITINERARY_CONCURRENCY", "8"))
 
-OSRM_PROFILE_MAP = {
-    "car": "driving",
-    "bike": "cycling",
-    "foot": "foot",
+POLYLINE_PRECISION = {
+    "polyline": 5,
+    "polyline6": 6,
 }
 
+
+def format_route(route: dict, format: str = "geojson", tolerance: float = 0) -> dict:
+    # Never mutate `route`, it may be the cached copy
+    coordinates = route["coordinates"]
+    if tolerance > 0:
+        coordinates = simplify(coordinates, tolerance)
+
+    formatted = {
+        "distance_m": route["distance_m"],
+        "duration_s": route["duration_s"],
+    }
+
+    if format == "geojson":
+        formatted["coordinates"] = coordinates  # 👈 IMPORTANT
+    else:
+        formatted["polyline"] = encode_polyline(coordinates, POLYLINE_PRECISION[format])
+
+    return formatted
+
+
 @router.get("/")
 async def get_route(
     profile: str,
@@ -27,39 +51,104 @@ async def get_route(
     start_lon: float,
     end_lat: float,
     end_lon: float,
+    format: Literal["geojson", "polyline", "polyline6"] = "geojson",
+    tolerance: float = Query(0, ge=0, description="Simplification tolerance in metres"),
 ):
-    if profile not in OSRM_SERVICES:
-        raise HTTPException(status_code=400, detail="Invalid profile")
-
-    osrm_profile = OSRM_PROFILE_MAP[profile]
+    # Cached per profile and snapped coordinates, see src/osrm.py
+    route = await fetch_route(profile, start_lat, start_lon, end_lat, end_lon)
 
-    url = (
-        f"{OSRM_SERVICES[profile]}/route/v1/{osrm_profile}/"
-        f"{start_lon},{start_lat};{end_lon},{end_lat}"
-        "?overview=full&geometries=geojson"
-    )
+    return format_route(route, format, tolerance)
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        response = await client.get(url)
 
-    if response.status_code != 200:
+@router.post("/matrix")
+async def get_route_matrix(req: RouteMatrixRequest):
+    if bool(req.coordinates) == bool(req.destination_ids):
         raise HTTPException(
-            status_code=500,
-            detail=response.text
+            status_code=400,
+            detail="Give either coordinates or destination_ids"
         )
 
-    data = response.json()
+    if req.coordinates:
+        points = [(c.latitude, c.longitude) for c in req.coordinates]
+    else:
+        places = await mongo.destinations.find(
+            {"id": {"$in": req.destination_ids}},
+            {"_id": 0, "id": 1, "latitude": 1, "longitude": 1}
+        ).to_list(length=None)
+        by_id = {place["id"]: place for place in places}
 
-    if not data.get("routes"):
-        raise HTTPException(
-            status_code=404,
-            detail="No route found"
-        )
+        missing = [i for i in req.destination_ids if i not in by_id]
+        if missing:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Unknown destination ids: {missing}"
+            )
+
+        points = [
+            (float(by_id[i]["latitude"]), float(by_id[i]["longitude"]))
+            for i in req.destination_ids
+        ]
 
-    route = data["routes"][0]
+    # One OSRM table call for the whole matrix, rows and columns follow
+    # the order of the request
+    matrix = await fetch_table(req.profile, points)
 
-    return {
-        "distance_m": route["distance"],
-        "duration_s": route["duration"],
-        "coordinates": route["geometry"]["coordinates"],  # 👈 IMPORTANT
+    return {"size": len(points), **matrix}
+
+
+def day_stops(day: ItineraryDay) -> List[Stop]:
+    # A finalized day visits its attractions in visit_order when it has one
+    stops = [*day.primary_attraction, *day.secondary_attraction]
+    if day.visit_order is None:
+        return stops
+
+    by_id = {stop.id: stop for stop in stops}
+    return [by_id[i] for i in day.visit_order if i in by_id]
+
+
+@router.post("/itinerary")
+async def get_itinerary(
+    req: ItineraryRequest,
+    format: Literal["geojson", "polyline", "polyline6"] = "geojson",
+    tolerance: float = Query(0, ge=0, description="Simplification tolerance in metres"),
+):
+    if (req.stops is None) == (req.days is None):
+        raise HTTPException(status_code=400, detail="Give either stops or days")
+
+    plans = {"stops": req.stops} if req.stops is not None else {
+        day: day_stops(plan) for day, plan in req.days.items()
     }
+
+    # Every leg of every day is routed concurrently, bounded per request
+    semaphore = asyncio.Semaphore(ITINERARY_CONCURRENCY)
+
+    async def route_leg(start: Stop, end: Stop) -> dict:
+        async with semaphore:
+            route = await fetch_route(
+                req.profile,
+                start.latitude, start.longitude,
+                end.latitude, end.longitude,
+            )
+
+        return {
+            "from": start.id,
+            "to": end.id,
+            **format_route(route, format, tolerance),
+        }
+
+    async def route_plan(stops: List[Stop]) -> dict:
+        legs = await asyncio.gather(*(
+            route_leg(start, end) for start, end in zip(stops, stops[1:])
+        ))
+        return {
+            "legs": legs,
+            "distance_m": sum(leg["distance_m"] for leg in legs),
+            "duration_s": sum(leg["duration_s"] for leg in legs),
+        }
+
+    results = await asyncio.gather(*(route_plan(stops) for stops in plans.values()))
+
+    if req.stops is not None:
+        return results[0]
+
+    return {"days": dict(zip(plans, results))}
@@ -1,50 +1,245 @@
-from fastapi import APIRouter, HTTPException
-from ..db import destinations
-from ..models import DestinationCreate, RecommendationRequest, FinalizedPlacesRequest
-from ..place_recommender import generate_recommendations, distribute_places_into_days
+import asyncio
+import os
+from collections import defaultdict
+from datetime import datetime
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import APIRouter, HTTPException, Request, Response
+from ..cache import LRUCache
+from ..catalog import catalog
+from ..etag import catalog_etag, not_modified
+from ..models import (
+    DestinationCreate,
+    RecommendationRequest,
+    RecommendationBatchRequest,
+    FinalizedPlacesRequest,
+)
+from ..osrm import fetch_table
+from ..place_recommender import (
+    generate_recommendations,
+    generate_batch_recommendations,
+    distribute_places_into_days,
+)
+from ..tour import fill_missing_durations, haversine_durations, optimize_order
+from ..weather_and_season import WeatherUnavailable, get_weather_for_places
+
+load_dotenv()
 
 router = APIRouter(prefix="/places", tags=["Recommendation"])
 
+RECOMMENDATION_CACHE_SIZE = int(os.getenv("RECOMMENDATION_CACHE_SIZE", "1024"))
+RECOMMENDATION_CACHE_TTL = float(os.getenv("RECOMMENDATION_CACHE_TTL", "600"))
+RECOMMENDATION_BATCH_MAX_SIZE = int(os.getenv("RECOMMENDATION_BATCH_MAX_SIZE", "1000"))
+
+# Results keyed on the normalized request and the catalog version they
+# were computed against, so a catalog write never serves stale results
+recommendation_cache = LRUCache(
+    maxsize=RECOMMENDATION_CACHE_SIZE,
+    ttl=RECOMMENDATION_CACHE_TTL,
+)
+
+
+def normalize_moods(moods):
+    return sorted(set(moods), key=lambda mood: mood.value)
+
+
+def trip_length(req: RecommendationRequest) -> int:
+    # Only the trip length matters to the recommender, not the dates
+    return (
+        datetime.fromisoformat(req.to_date) - datetime.fromisoformat(req.from_date)
+    ).days + 1
+
+
+def recommendation_key(req: RecommendationRequest, moods, version) -> tuple:
+    return (
+        req.location,
+        tuple(mood.value for mood in moods),
+        req.budget,
+        trip_length(req),
+        req.limit,
+        req.view,
+        version,
+    )
+
+
 @router.post("/recommend")
-def get_recommendation(req: RecommendationRequest):
+async def get_recommendation(req: RecommendationRequest, request: Request, response: Response):
+    # Same request against the same catalog gives the same answer
+    etag = catalog_etag("recommend", req.model_dump())
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+
     location = req.location
     from_date = req.from_date
     to_date = req.to_date
-    moods = req.moods
+    moods = normalize_moods(req.moods)
     budget = req.budget
 
-    places = list(
-        destinations.find(
-            {"location": location},
-            {"_id": 0}  # 👈 IMPORTANT
-        )
-    )
+    index = await catalog.get(location)
 
-    if not places:
+    if index is None:
         raise HTTPException(
             status_code=400,
             detail="Invalid Location"
         )
 
-    recommendations = generate_recommendations(
-        places,
+    key = recommendation_key(req, moods, catalog.version)
+    recommendations = recommendation_cache.get(key)
+    if recommendations is not None:
+        if etag:
+            response.headers["ETag"] = etag
+        return recommendations
+
+    # Scoring is CPU bound, keep it off the event loop
+    recommendations = await asyncio.to_thread(
+        generate_recommendations,
+        index.places,
         from_date,
         to_date,
         moods,
-        budget
+        budget,
+        index=index,
+        limit=req.limit,
+        view=req.view
     )
 
+    # Lets clients tell whether their cached catalog can hydrate the ids
+    if req.view == "compact":
+        recommendations["catalog_version"] = key[-1]
+
+    recommendation_cache.set(key, recommendations)
+
+    if etag:
+        response.headers["ETag"] = etag
+
     return recommendations
 
 
+@router.post("/recommend/batch")
+async def get_batch_recommendations(batch: RecommendationBatchRequest):
+    if len(batch.requests) > RECOMMENDATION_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {RECOMMENDATION_BATCH_MAX_SIZE} requests per batch"
+        )
+
+    results = [None] * len(batch.requests)
+
+    by_location = defaultdict(list)
+    for i, req in enumerate(batch.requests):
+        by_location[req.location].append(i)
+
+    for location, positions in by_location.items():
+        index = await catalog.get(location)
+
+        if index is None:
+            for i in positions:
+                results[i] = {"detail": "Invalid Location"}
+            continue
+
+        # Cached results are reused, identical requests computed once
+        version = catalog.version
+        misses = defaultdict(list)
+        for i in positions:
+            req = batch.requests[i]
+            moods = normalize_moods(req.moods)
+            key = recommendation_key(req, moods, version)
+
+            cached = recommendation_cache.get(key)
+            if cached is not None:
+                results[i] = cached
+            else:
+                misses[key].append(i)
+
+        pending = [(key, batch.requests[ids[0]]) for key, ids in misses.items()]
+        # Scoring is CPU bound, keep it off the event loop
+        computed = await asyncio.to_thread(generate_batch_recommendations, index, [
+            {
+                "moods": normalize_moods(req.moods),
+                "trip_days": key[3],
+                "budget": req.budget,
+                "limit": req.limit,
+                "view": req.view,
+            }
+            for key, req in pending
+        ])
+
+        for (key, req), recommendations in zip(pending, computed):
+            if req.view == "compact":
+                recommendations["catalog_version"] = version
+
+            recommendation_cache.set(key, recommendations)
+            for i in misses[key]:
+                results[i] = recommendations
+
+    return results
+
+
 @router.post("/finalize")
-def finalize_places(req: FinalizedPlacesRequest):
-  return distribute_places_into_days(
-      req.primary_attractions,
-      req.secondary_attractions,
+async def finalize_places(req: FinalizedPlacesRequest):
+  if req.cluster_days and req.max_per_day is not None:
+    raise HTTPException(
+        status_code=400,
+        detail="max_per_day can't be combined with cluster_days"
+    )
+
+  # The scheduler works on plain dicts like the ones stored in Mongo
+  primary_attractions = [place.dict() for place in req.primary_attractions]
+  secondary_attractions = [place.dict() for place in req.secondary_attractions]
+
+  try:
+    weather_by_cell = await get_weather_for_places(
+        [*primary_attractions, *secondary_attractions],
+        req.from_date,
+        req.to_date
+    )
+  except (WeatherUnavailable, httpx.HTTPError):
+    raise HTTPException(
+        status_code=502,
+        detail="Weather data unavailable for the requested dates"
+    )
+
+  trip_places_per_day = distribute_places_into_days(
+      primary_attractions,
+      secondary_attractions,
       req.food_places,
       req.accomodations,
       req.from_date,
-      req.to_date
+      req.to_date,
+      weather_by_cell=weather_by_cell,
+      max_per_day=req.max_per_day,
+      cluster_days=req.cluster_days
   )
 
+  if req.optimize_order:
+    await asyncio.gather(*(
+        order_day(day, req.profile) for day in trip_places_per_day.values()
+    ))
+
+  return trip_places_per_day
+
+
+async def order_day(day: dict, profile: str):
+  # Visiting order of the day's attractions and the travel time it takes
+  places = [*day["primary_attraction"], *day["secondary_attraction"]]
+
+  order, travel_time = list(range(len(places))), 0.0
+  if len(places) > 1:
+    try:
+      table = await fetch_table(
+          profile,
+          [(float(p["latitude"]), float(p["longitude"])) for p in places]
+      )
+      # Unreachable pairs come back as null, an infinite travel time
+      # would not serialize
+      durations = fill_missing_durations(table["durations_s"], places, profile)
+    except (HTTPException, httpx.HTTPError):
+      # OSRM down or profile unknown, straight lines are better than nothing
+      durations = haversine_durations(places, profile)
+
+    order, travel_time = await asyncio.to_thread(optimize_order, durations)
+
+  day["visit_order"] = [places[i]["id"] for i in order]
+  day["travel_time_s"] = travel_time
@@ -1,26 +1,61 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import Union
 
-import bcrypt
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
 
+from src.routes import adminRoute
 from src.routes import dummyroute
 from src.routes import destinationsRoute
 from src.routes import osrmRoute
 from src.routes import recommend
 
+from src.catalog import catalog
 from src.jwttoken import create_access_token
-from src.db import users
+from src.db import mongo
 from src.models import UserCreate
+from src.osrm import osrm_clients
+from src.password_hasher import password_hasher
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# LIFESPAN
+# ---------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    mongo.connect()
+    # Logs and skips collections whose indexes can't be created
+    await mongo.ensure_indexes()
+    osrm_clients.open()
+
+    # Warm the catalog so the first recommendation skips Mongo, then keep
+    # it in sync with writes made by other nodes. A failed warm-up is
+    # retried by the first request that needs the catalog.
+    try:
+        await catalog.load()
+    except Exception:
+        logger.exception("Catalog warm-up failed")
+    catalog_poller = asyncio.create_task(catalog.poll_forever())
+
+    yield
+
+    catalog_poller.cancel()
+    mongo.close()
+    await osrm_clients.close()
+    password_hasher.shutdown()
 
 # ---------------------------
 # APP INIT
 # ---------------------------
 app = FastAPI(
     title="Travlapes Backend",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # ---------------------------
@@ -41,24 +76,23 @@ app.include_router(dummyroute.router)
 app.include_router(destinationsRoute.router)
 app.include_router(osrmRoute.router)
 app.include_router(recommend.router)
+app.include_router(adminRoute.router)
 
 # ---------------------------
 # AUTH
 # ---------------------------
 @app.post("/register", status_code=201)
-def register(user: UserCreate):
-    if users.find_one({"username": user.username}):
+async def register(user: UserCreate):
+    if await mongo.users.find_one({"username": user.username}):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="User already exists"
         )
 
-    hashed_pw = bcrypt.hashpw(
-        user.password.encode("utf-8"),
-        bcrypt.gensalt()
-    ).decode("utf-8")
+    # Hashing runs on its own bounded pool and answers 503 when saturated
+    hashed_pw = await password_hasher.hash(user.password)
 
-    users.insert_one({
+    await mongo.users.insert_one({
         "username": user.username,
         "email": user.email,
         "password": hashed_pw,
@@ -69,16 +103,13 @@ def register(user: UserCreate):
 
 
 @app.post("/login")
-def login(form: OAuth2PasswordRequestForm = Depends()):
-    user = users.find_one({"username": form.username})
+async def login(form: OAuth2PasswordRequestForm = Depends()):
+    user = await mongo.users.find_one({"username": form.username})
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    if not bcrypt.checkpw(
-        form.password.encode("utf-8"),
-        user["password"].encode("utf-8")
-    ):
+    if not await password_hasher.verify(form.password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     token = create_access_token(data={"sub": user["username"]})
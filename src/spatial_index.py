@@ -0,0 +1,152 @@
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+
+
+def haversine_batch(lat1, lon1, lat2, lon2) -> np.ndarray:
+    # Same formula as place_recommender.haversine, broadcast over arrays
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = np.radians(np.subtract(lat2, lat1))
+    dlambda = np.radians(np.subtract(lon2, lon1))
+
+    a = (
+        np.sin(dphi / 2) ** 2
+        + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    )
+
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+class SpatialGrid:
+    """Bucket grid over a set of points for radius queries.
+
+    Cells are ``cell_km`` tall; their width in longitude is stretched for
+    the highest latitude in the set so a radius query only has to look at
+    the few cells around the query point before computing exact distances.
+    """
+
+    def __init__(self, lats: Iterable[float], lons: Iterable[float], cell_km: float = 2.0):
+        self.lats = np.asarray(list(lats), dtype=float)
+        self.lons = np.asarray(list(lons), dtype=float)
+        self.max_abs_lat = float(np.abs(self.lats).max()) if len(self.lats) else 0.0
+
+        self.cell_lat = math.degrees(cell_km / EARTH_RADIUS_KM)
+        self.cell_lon = self.cell_lat / max(math.cos(math.radians(self.max_abs_lat)), 1e-6)
+
+        buckets: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        for i, (row, col) in enumerate(zip(*self._cells(self.lats, self.lons))):
+            buckets[(row, col)].append(i)
+
+        self.cells = {cell: np.asarray(ids) for cell, ids in buckets.items()}
+
+    @classmethod
+    def from_places(cls, places: Iterable[dict], cell_km: float = 2.0):
+        places = list(places)
+        return cls(
+            (float(place["latitude"]) for place in places),
+            (float(place["longitude"]) for place in places),
+            cell_km=cell_km,
+        )
+
+    def _cells(self, lats, lons):
+        rows = np.floor(lats / self.cell_lat).astype(int)
+        cols = np.floor(lons / self.cell_lon).astype(int)
+        return rows, cols
+
+    def _rings(self, radius_km: float) -> Tuple[int, int]:
+        # Bounding box of a great circle radius, widest at the highest
+        # latitude a matching pair can reach
+        lat_span = math.degrees(radius_km / EARTH_RADIUS_KM)
+        top = math.radians(min(self.max_abs_lat + lat_span, 90.0))
+        ratio = math.sin(radius_km / EARTH_RADIUS_KM) / max(math.cos(top), 1e-12)
+        lon_span = 180.0 if ratio >= 1 else math.degrees(math.asin(ratio))
+
+        return math.ceil(lat_span / self.cell_lat), math.ceil(lon_span / self.cell_lon)
+
+    def _neighbours(self, row: int, col: int, row_rings: int, col_rings: int) -> np.ndarray:
+        if (2 * row_rings + 1) * (2 * col_rings + 1) > len(self.cells):
+            # Cheaper to walk the occupied cells than the whole box
+            ids = [
+                cell_ids
+                for (r, c), cell_ids in self.cells.items()
+                if abs(r - row) <= row_rings and abs(c - col) <= col_rings
+            ]
+        else:
+            ids = [
+                self.cells[(r, c)]
+                for r in range(row - row_rings, row + row_rings + 1)
+                for c in range(col - col_rings, col + col_rings + 1)
+                if (r, c) in self.cells
+            ]
+
+        return np.concatenate(ids) if ids else np.empty(0, dtype=int)
+
+    def within(self, lats: Iterable[float], lons: Iterable[float], radius_km: float) -> np.ndarray:
+        """Mask of query points lying within ``radius_km`` of any grid point."""
+        lats = np.asarray(list(lats), dtype=float)
+        lons = np.asarray(list(lons), dtype=float)
+        found = np.zeros(len(lats), dtype=bool)
+
+        if not len(lats) or not self.cells:
+            return found
+
+        row_rings, col_rings = self._rings(radius_km)
+        rows, cols = self._cells(lats, lons)
+
+        # Queries sharing a cell share the same neighbouring points
+        queries: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        for i, (row, col) in enumerate(zip(rows, cols)):
+            queries[(int(row), int(col))].append(i)
+
+        for (row, col), query_ids in queries.items():
+            ids = self._neighbours(row, col, row_rings, col_rings)
+            if not len(ids):
+                continue
+
+            query_ids = np.asarray(query_ids)
+            distances = haversine_batch(
+                lats[query_ids, None], lons[query_ids, None],
+                self.lats[None, ids], self.lons[None, ids],
+            )
+            found[query_ids] = (distances <= radius_km).any(axis=1)
+
+        return found
+
+    def query(
+        self, lats: Iterable[float], lons: Iterable[float], radius_km: float
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Ids and distances of the grid points within ``radius_km`` of each
+        query point."""
+        lats = np.asarray(list(lats), dtype=float)
+        lons = np.asarray(list(lons), dtype=float)
+        empty = (np.empty(0, dtype=int), np.empty(0, dtype=float))
+        matches = [empty] * len(lats)
+
+        if not len(lats) or not self.cells:
+            return matches
+
+        row_rings, col_rings = self._rings(radius_km)
+        rows, cols = self._cells(lats, lons)
+
+        queries: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        for i, (row, col) in enumerate(zip(rows, cols)):
+            queries[(int(row), int(col))].append(i)
+
+        for (row, col), query_ids in queries.items():
+            ids = self._neighbours(row, col, row_rings, col_rings)
+            if not len(ids):
+                continue
+
+            distances = haversine_batch(
+                lats[query_ids, None], lons[query_ids, None],
+                self.lats[None, ids], self.lons[None, ids],
+            )
+            for query_id, row_distances in zip(query_ids, distances):
+                near = row_distances <= radius_km
+                matches[query_id] = (ids[near], row_distances[near])
+
+        return matches
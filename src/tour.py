@@ -0,0 +1,112 @@
+import math
+import os
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .spatial_index import haversine_batch
+
+# Time the optimizer may spend on one day's places
+TOUR_TIME_BUDGET_S = float(os.getenv("TOUR_TIME_BUDGET_S", "0.05"))
+
+# Average speeds used when OSRM can't provide travel times, in km/h
+FALLBACK_SPEED_KMH = {
+    "car": 25.0,
+    "bike": 12.0,
+    "foot": 4.5,
+}
+
+
+def haversine_durations(places: Sequence[dict], profile: str = "car") -> np.ndarray:
+    """Straight-line travel time matrix in seconds between ``places``."""
+    lats = np.asarray([float(place["latitude"]) for place in places])
+    lons = np.asarray([float(place["longitude"]) for place in places])
+
+    distances_km = haversine_batch(lats[:, None], lons[:, None], lats[None, :], lons[None, :])
+    return distances_km / FALLBACK_SPEED_KMH.get(profile, FALLBACK_SPEED_KMH["car"]) * 3600
+
+
+def fill_missing_durations(
+    durations: Sequence[Sequence[Optional[float]]],
+    places: Sequence[dict],
+    profile: str = "car",
+) -> np.ndarray:
+    """``durations`` with missing (``None``) entries, which OSRM returns for
+    unreachable pairs, replaced by straight-line travel times."""
+    matrix = np.array(
+        [[math.nan if value is None else value for value in row] for row in durations],
+        dtype=float,
+    )
+    missing = np.isnan(matrix)
+    if missing.any():
+        matrix[missing] = haversine_durations(places, profile)[missing]
+    return matrix
+
+
+def _path_cost(durations: np.ndarray, order: List[int]) -> float:
+    return float(sum(durations[a, b] for a, b in zip(order, order[1:])))
+
+
+def _nearest_neighbour(durations: np.ndarray, start: int) -> List[int]:
+    unvisited = np.ones(len(durations), dtype=bool)
+    unvisited[start] = False
+    order = [start]
+
+    for _ in range(len(durations) - 1):
+        candidates = np.flatnonzero(unvisited)
+        nearest = int(candidates[np.argmin(durations[order[-1], candidates])])
+        unvisited[nearest] = False
+        order.append(nearest)
+
+    return order
+
+
+def optimize_order(
+    durations: Sequence[Sequence[Optional[float]]],
+    time_budget_s: float = TOUR_TIME_BUDGET_S,
+) -> Tuple[List[int], float]:
+    """Short open path through every point of a travel time matrix.
+
+    Nearest neighbour from as many start points as ``time_budget_s``
+    allows (at least one), then 2-opt on the best path until no move helps
+    or the budget runs out. Works on asymmetric
+    matrices; missing (``None``) entries count as unreachable.
+    Returns the visiting order and its total travel time.
+    """
+    matrix = np.array(
+        [[math.inf if value is None else value for value in row] for row in durations],
+        dtype=float,
+    )
+    n = len(matrix)
+    if n <= 1:
+        return list(range(n)), 0.0
+
+    deadline = time.perf_counter() + time_budget_s
+
+    best = _nearest_neighbour(matrix, 0)
+    best_cost = _path_cost(matrix, best)
+    for start in range(1, n):
+        if time.perf_counter() >= deadline:
+            break
+
+        order = _nearest_neighbour(matrix, start)
+        cost = _path_cost(matrix, order)
+        if cost < best_cost:
+            best, best_cost = order, cost
+
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(n - 1):
+            for k in range(i + 1, n):
+                candidate = best[:i] + best[i:k + 1][::-1] + best[k + 1:]
+                cost = _path_cost(matrix, candidate)
+                if cost < best_cost - 1e-9:
+                    best, best_cost = candidate, cost
+                    improved = True
+
+            if time.perf_counter() >= deadline:
+                break
+
+    return best, best_cost
@@ -1,9 +1,20 @@
+import asyncio
+import os
 from datetime import date as date_cls
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
 
+import httpx
 import requests
 
 from .models import Season, Weather
+from .weather_cache import weather_cache
+
+# Open-Meteo's archive trails real time by a few days; newer data can still change
+ARCHIVE_DELAY_DAYS = 5
+
+# Open-Meteo requests in flight while resolving weather for many places
+WEATHER_CONCURRENCY = int(os.getenv("WEATHER_CONCURRENCY", "8"))
 
 
 def get_season(date_str: str) -> Season:
@@ -19,44 +30,203 @@ def get_season(date_str: str) -> Season:
         return Season.winter
 
 
-def get_weather_for_date(
-    latitude: float,
-    longitude: float,
-    date_str: str,
-    timezone: str = "Asia/Kathmandu",
-) -> Weather:
-    query_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-    today = date_cls.today()
+ARCHIVE_URL = "https://archive-api.open-meteo.com/v1/archive"
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+
 
-    # Choose correct endpoint
-    if query_date <= today:
-        base_url = "https://archive-api.open-meteo.com/v1/archive"
+class WeatherUnavailable(RuntimeError):
+    """Open-Meteo returned no usable weather for some requested day."""
+
+
+def classify_weather(precipitation: float, cloudcover: float) -> Weather:
+    if precipitation > 0:
+        return Weather.rainy
+    elif cloudcover > 60:
+        return Weather.cloudy
     else:
-        base_url = "https://api.open-meteo.com/v1/forecast"
+        return Weather.sunny
+
 
-    params = {
+def _daily_params(
+    latitude: float,
+    longitude: float,
+    days: List[date_cls],
+    timezone: str,
+) -> dict:
+    return {
         "latitude": latitude,
         "longitude": longitude,
-        "start_date": date_str,
-        "end_date": date_str,
+        "start_date": days[0].isoformat(),
+        "end_date": days[-1].isoformat(),
         "daily": "precipitation_sum,cloudcover_mean",
         "timezone": timezone,
     }
 
-    resp = requests.get(base_url, params=params, timeout=10)
-    resp.raise_for_status()
-    data = resp.json()
 
+def _parse_daily(data: dict) -> Dict[str, Weather]:
     daily = data.get("daily")
     if not daily:
-        raise RuntimeError(f"No daily weather data returned: {data}")
+        raise WeatherUnavailable(f"No daily weather data returned: {data}")
 
-    precipitation = daily["precipitation_sum"][0]
-    cloudcover = daily["cloudcover_mean"][0]
+    # Days the provider has no values for yet come back as nulls; leave
+    # them out so the caller reports them as missing
+    return {
+        day: classify_weather(precipitation, cloudcover)
+        for day, precipitation, cloudcover in zip(
+            daily["time"], daily["precipitation_sum"], daily["cloudcover_mean"]
+        )
+        if precipitation is not None and cloudcover is not None
+    }
 
-    if precipitation > 0:
-        return Weather.rainy
-    elif cloudcover > 60:
-        return Weather.cloudy
-    else:
-        return Weather.sunny
+
+def _plan_range(
+    latitude: float,
+    longitude: float,
+    from_date: str,
+    to_date: str,
+    timezone: str,
+) -> Tuple[Dict[str, Weather], List[Tuple[str, List[date_cls]]]]:
+    # Returns the cached days and the requests needed for the missing ones
+    start = datetime.strptime(from_date, "%Y-%m-%d").date()
+    end = datetime.strptime(to_date, "%Y-%m-%d").date()
+    settled = date_cls.today() - timedelta(days=ARCHIVE_DELAY_DAYS)
+
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    weather_by_date = weather_cache.get_many(
+        latitude, longitude, (day.isoformat() for day in days), timezone
+    )
+    missing = [day for day in days if day.isoformat() not in weather_by_date]
+
+    # Settled days come from the archive; the last few days, which the
+    # archive does not have yet, and the future come from the forecast.
+    # At most one request to each for the whole window.
+    archive_days = [day for day in missing if day < settled]
+    forecast_days = [day for day in missing if day >= settled]
+
+    requests_needed = [
+        (base_url, days)
+        for base_url, days in ((ARCHIVE_URL, archive_days), (FORECAST_URL, forecast_days))
+        if days
+    ]
+    return weather_by_date, requests_needed
+
+
+def _store_range(
+    latitude: float,
+    longitude: float,
+    days: List[date_cls],
+    fetched: Dict[str, Weather],
+    timezone: str,
+    weather_by_date: Dict[str, Weather],
+):
+    settled = date_cls.today() - timedelta(days=ARCHIVE_DELAY_DAYS)
+
+    entries = []
+    for day in days:
+        weather = fetched.get(day.isoformat())
+        if weather is None:
+            raise WeatherUnavailable(f"No weather data returned for {day.isoformat()}")
+
+        entries.append((day.isoformat(), weather, day < settled))
+
+    # One transaction for the whole range
+    weather_cache.set_many(latitude, longitude, timezone, entries)
+    weather_by_date.update((date_str, weather) for date_str, weather, _ in entries)
+
+
+def get_weather_for_range(
+    latitude: float,
+    longitude: float,
+    from_date: str,
+    to_date: str,
+    timezone: str = "Asia/Kathmandu",
+) -> Dict[str, Weather]:
+    # Nearby points share a grid cell and therefore one cached lookup
+    latitude, longitude = weather_cache.snap(latitude, longitude)
+    weather_by_date, requests_needed = _plan_range(
+        latitude, longitude, from_date, to_date, timezone
+    )
+
+    for base_url, days in requests_needed:
+        resp = requests.get(
+            base_url,
+            params=_daily_params(latitude, longitude, days, timezone),
+            timeout=10,
+        )
+        resp.raise_for_status()
+
+        _store_range(
+            latitude, longitude, days, _parse_daily(resp.json()), timezone, weather_by_date
+        )
+
+    return weather_by_date
+
+
+async def _fetch_cell_weather(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    cell: Tuple[float, float],
+    from_date: str,
+    to_date: str,
+    timezone: str,
+) -> Dict[str, Weather]:
+    latitude, longitude = cell
+    # The cache reads and writes SQLite, keep them off the event loop
+    weather_by_date, requests_needed = await asyncio.to_thread(
+        _plan_range, latitude, longitude, from_date, to_date, timezone
+    )
+
+    async def fetch(base_url, days):
+        async with semaphore:
+            resp = await client.get(
+                base_url, params=_daily_params(latitude, longitude, days, timezone)
+            )
+        resp.raise_for_status()
+        await asyncio.to_thread(
+            _store_range,
+            latitude, longitude, days, _parse_daily(resp.json()), timezone, weather_by_date
+        )
+
+    await asyncio.gather(*(fetch(base_url, days) for base_url, days in requests_needed))
+    return weather_by_date
+
+
+async def get_weather_for_places(
+    places: Iterable[dict],
+    from_date: str,
+    to_date: str,
+    timezone: str = "Asia/Kathmandu",
+    concurrency: int = WEATHER_CONCURRENCY,
+) -> Dict[Tuple[float, float], Dict[str, Weather]]:
+    """Weather of every grid cell holding one of ``places``.
+
+    Each cell is fetched once no matter how many places fall into it, with
+    at most ``concurrency`` Open-Meteo requests in flight. Look a place up
+    with ``weather_cache.snap(latitude, longitude)``.
+    """
+    from_date = datetime.fromisoformat(from_date).date().isoformat()
+    to_date = datetime.fromisoformat(to_date).date().isoformat()
+
+    cells = list(dict.fromkeys(
+        weather_cache.snap(place["latitude"], place["longitude"]) for place in places
+    ))
+    if not cells:
+        return {}
+
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(timeout=10) as client:
+        results = await asyncio.gather(*(
+            _fetch_cell_weather(client, semaphore, cell, from_date, to_date, timezone)
+            for cell in cells
+        ))
+
+    return dict(zip(cells, results))
+
+
+def get_weather_for_date(
+    latitude: float,
+    longitude: float,
+    date_str: str,
+    timezone: str = "Asia/Kathmandu",
+) -> Weather:
+    return get_weather_for_range(latitude, longitude, date_str, date_str, timezone)[date_str]
@@ -0,0 +1,161 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from .cache import LRUCache
+from .models import Weather
+
+load_dotenv()
+
+WEATHER_CACHE_PATH = os.getenv("WEATHER_CACHE_PATH", "weather_cache.sqlite3")
+# Coordinates are snapped to a grid of this many degrees (~5.5km at 0.05)
+WEATHER_CACHE_GRID = float(os.getenv("WEATHER_CACHE_GRID", "0.05"))
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "4096"))
+WEATHER_FORECAST_TTL = float(os.getenv("WEATHER_FORECAST_TTL", str(3 * 60 * 60)))
+
+
+class WeatherCache:
+    """In-memory LRU in front of a SQLite table of daily weather.
+
+    Archive entries never expire, forecasts live for ``forecast_ttl``
+    seconds in both tiers.
+    """
+
+    def __init__(
+        self,
+        path: str = WEATHER_CACHE_PATH,
+        grid: float = WEATHER_CACHE_GRID,
+        memory_size: int = WEATHER_CACHE_SIZE,
+        forecast_ttl: float = WEATHER_FORECAST_TTL,
+    ):
+        self.path = path
+        self.grid = grid
+        self.forecast_ttl = forecast_ttl
+        self.memory = LRUCache(maxsize=memory_size)
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS weather ("
+                " key TEXT PRIMARY KEY,"
+                " weather TEXT NOT NULL,"
+                " expires_at REAL"
+                ")"
+            )
+            self._conn.commit()
+
+        return self._conn
+
+    def snap(self, latitude: float, longitude: float) -> Tuple[float, float]:
+        return (
+            round(round(float(latitude) / self.grid) * self.grid, 6),
+            round(round(float(longitude) / self.grid) * self.grid, 6),
+        )
+
+    def key(self, latitude: float, longitude: float, date_str: str, timezone: str) -> str:
+        latitude, longitude = self.snap(latitude, longitude)
+        return f"{latitude:.6f},{longitude:.6f}|{timezone}|{date_str}"
+
+    def get_many(
+        self,
+        latitude: float,
+        longitude: float,
+        date_strs: Iterable[str],
+        timezone: str,
+    ) -> Dict[str, Weather]:
+        """Cached weather of several days of one point, with a single query
+        for the days the memory tier does not have."""
+        found: Dict[str, Weather] = {}
+        keys = {}
+        for date_str in date_strs:
+            key = self.key(latitude, longitude, date_str, timezone)
+            weather = self.memory.get(key)
+            if weather is None:
+                keys[key] = date_str
+            else:
+                found[date_str] = weather
+
+        if not keys:
+            return found
+
+        with self._lock:
+            rows = self._db().execute(
+                f"SELECT key, weather, expires_at FROM weather"
+                f" WHERE key IN ({', '.join('?' * len(keys))})",
+                list(keys),
+            ).fetchall()
+
+        now = time.time()
+        disk_hits = 0
+        for key, value, expires_at in rows:
+            if expires_at is not None and expires_at <= now:
+                continue
+
+            weather = Weather(value)
+            ttl = None if expires_at is None else expires_at - now
+            self.memory.set(key, weather, ttl=ttl)
+            found[keys[key]] = weather
+            disk_hits += 1
+
+        self.disk_hits += disk_hits
+        self.misses += len(keys) - disk_hits
+        return found
+
+    def set_many(
+        self,
+        latitude: float,
+        longitude: float,
+        timezone: str,
+        entries: Iterable[Tuple[str, Weather, bool]],
+    ):
+        """Store ``(date_str, weather, archived)`` entries of one point in a
+        single transaction."""
+        now = time.time()
+        rows = []
+        for date_str, weather, archived in entries:
+            key = self.key(latitude, longitude, date_str, timezone)
+            ttl = None if archived else self.forecast_ttl
+            self.memory.set(key, weather, ttl=ttl)
+            rows.append((key, weather.value, None if ttl is None else now + ttl))
+
+        if not rows:
+            return
+
+        with self._lock:
+            db = self._db()
+            db.executemany(
+                "INSERT OR REPLACE INTO weather (key, weather, expires_at) VALUES (?, ?, ?)",
+                rows,
+            )
+            db.commit()
+
+    def clear(self):
+        self.memory.clear()
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM weather")
+            db.commit()
+
+    def stats(self) -> dict:
+        memory = self.memory.stats()
+        lookups = memory["hits"] + self.disk_hits + self.misses
+        return {
+            "memory": memory,
+            "memory_hits": memory["hits"],
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (memory["hits"] + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+
+weather_cache = WeatherCache()
@@ -0,0 +1,22 @@
+import json
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+CITIES = ["kathmandu", "lalitpur", "bhaktapur", "pokhara"]
+
+
+def load_city(city: str) -> list:
+    # The bundled city files as they are stored in Mongo, with an id per place
+    with open(ROOT / f"{city}.json") as f:
+        places = json.load(f)
+
+    for place_id, place in enumerate(places, start=1):
+        place["id"] = place_id
+    return places
+
+
+@pytest.fixture(params=CITIES)
+def city_places(request):
+    return load_city(request.param)
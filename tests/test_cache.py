@@ -0,0 +1,48 @@
+from src.cache import LRUCache
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entries_are_misses():
+    cache = LRUCache(ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=-1)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_evicts_by_bytes():
+    cache = LRUCache(maxsize=100, maxbytes=10, sizeof=len)
+    cache.set("a", "xxxx")
+    cache.set("b", "xxxx")
+    cache.set("c", "xxxx")
+
+    assert cache.get("a") is None
+    assert cache.get("b") == "xxxx" and cache.get("c") == "xxxx"
+    assert cache.bytes == 8
+
+    # Replacing an entry releases its old size
+    cache.set("b", "x")
+    assert cache.bytes == 5
+    assert cache.pop("c") == "xxxx"
+    assert cache.bytes == 1
+
+
+def test_oversized_entry_is_not_kept():
+    cache = LRUCache(maxbytes=4, sizeof=len)
+    cache.set("a", "xx")
+    cache.set("b", "xxxxxx")
+
+    assert len(cache) == 0 and cache.bytes == 0
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+from pymongo.errors import ServerSelectionTimeoutError
+
+from src.catalog import Catalog
+from src.place_index import PlaceIndex
+
+
+def test_waiting_requests_share_one_load():
+    catalog = Catalog()
+    index = PlaceIndex([{
+        "id": 1, "latitude": 27.7, "longitude": 85.3,
+        "category": "temple", "compatable_moods": ["cultural"],
+    }])
+    loads = []
+
+    async def load():
+        loads.append(1)
+        await asyncio.sleep(0.01)
+        catalog._indexes = {"Kathmandu": index}
+        catalog.version = 1
+
+    catalog._load = load
+
+    async def requests():
+        return await asyncio.gather(*(catalog.get("Kathmandu") for _ in range(10)))
+
+    assert all(result is index for result in asyncio.run(requests()))
+    assert len(loads) == 1
+
+
+def test_poller_survives_errors():
+    catalog = Catalog()
+    errors = [ServerSelectionTimeoutError("down"), KeyError("latitude"), ValueError("bad")]
+
+    async def poll():
+        if not errors:
+            raise asyncio.CancelledError
+        raise errors.pop(0)
+
+    catalog.poll = poll
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(catalog.poll_forever(interval=0))
+    assert not errors
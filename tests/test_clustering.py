@@ -0,0 +1,58 @@
+import math
+
+import numpy as np
+import pytest
+
+from src.clustering import balanced_kmeans
+from src.place_recommender import cluster_places, distribute_places_into_days
+
+
+def test_clusters_respect_capacity():
+    rng = np.random.default_rng(0)
+    # Most points in one corner, so plain k-means would overfill a cluster
+    lats = np.concatenate((rng.normal(27.70, 0.002, 40), rng.uniform(27.6, 27.8, 13)))
+    lons = np.concatenate((rng.normal(85.30, 0.002, 40), rng.uniform(85.2, 85.4, 13)))
+
+    for k in (2, 3, 5):
+        labels = balanced_kmeans(lats, lons, k)
+        assert labels.min() >= 0
+        assert np.bincount(labels).max() <= math.ceil(len(lats) / k)
+
+
+def test_clusters_are_deterministic_and_compact():
+    lats = [27.70, 27.701, 27.702, 27.80, 27.801, 27.802]
+    lons = [85.30, 85.301, 85.302, 85.40, 85.401, 85.402]
+
+    labels = balanced_kmeans(lats, lons, 2)
+    assert np.array_equal(labels, balanced_kmeans(lats, lons, 2))
+    assert len(set(labels[:3])) == 1 and len(set(labels[3:])) == 1
+    assert labels[0] != labels[3]
+
+
+def test_fewer_points_than_clusters():
+    assert balanced_kmeans([27.7], [85.3], 3).tolist() == [0]
+    assert balanced_kmeans([27.7, 27.8], [85.3, 85.4], 1).tolist() == [0, 0]
+
+
+def test_cluster_places_one_area_per_day():
+    places = [
+        {"id": i, "latitude": lat, "longitude": lon}
+        for i, (lat, lon) in enumerate([
+            (27.70, 85.30), (27.701, 85.301), (27.80, 85.40), (27.801, 85.401),
+        ])
+    ]
+
+    days = cluster_places(places, [0b11] * 4, 2)
+    assert sorted(sorted(place["id"] for place in day) for day in days) == [[0, 1], [2, 3]]
+
+    # A place that doesn't suit its cluster's day goes to a day it suits
+    days = cluster_places(places, [0b01, 0b01, 0b10, 0b01], 2)
+    assert [[place["id"] for place in day] for day in days] == [[0, 1, 3], [2]]
+
+
+def test_cluster_days_rejects_max_per_day():
+    with pytest.raises(ValueError):
+        distribute_places_into_days(
+            [], [], [], [], "2025-12-20", "2025-12-21",
+            weather_by_cell={}, max_per_day=2, cluster_days=True
+        )
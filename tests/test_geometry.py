@@ -0,0 +1,31 @@
+from src.geometry import encode_polyline, simplify
+
+
+def test_encode_polyline_reference_example():
+    # The example from Google's polyline format documentation
+    points = [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]]
+    assert encode_polyline(points) == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+
+def test_encode_polyline_precision():
+    assert encode_polyline([[0.000001, 0.000001]], precision=6) == "AA"
+    assert encode_polyline([[0.000001, 0.000001]]) == "??"
+    assert encode_polyline([]) == ""
+
+
+def test_simplify_drops_collinear_points():
+    line = [[85.30 + i * 0.001, 27.70] for i in range(10)]
+    assert simplify(line, 1) == [line[0], line[-1]]
+
+
+def test_simplify_keeps_points_past_tolerance():
+    # The middle point is about 111 m off the line between the ends
+    points = [[85.30, 27.70], [85.31, 27.701], [85.32, 27.70]]
+    assert simplify(points, 50) == points
+    assert simplify(points, 200) == [points[0], points[-1]]
+
+
+def test_simplify_without_tolerance_returns_input():
+    points = [[85.30, 27.70], [85.31, 27.701], [85.32, 27.70]]
+    assert simplify(points, 0) == points
+    assert simplify(points[:2], 50) == points[:2]
@@ -0,0 +1,37 @@
+from src import neighbors
+from src.place_index import CATEGORY_CODES, NEIGHBOR_BUCKETS, PlaceIndex
+from src.spatial_index import haversine_batch
+
+
+def test_lists_hold_the_bucket_places_within_radius(city_places):
+    index = PlaceIndex(city_places)
+    lists = neighbors.compute_neighbors(city_places)
+    assert lists
+
+    for place_id, buckets in lists.items():
+        place = index.positions[place_id]
+        distances = haversine_batch(
+            index.latitude[place], index.longitude[place], index.latitude, index.longitude
+        )
+        for bucket, (radius_km, categories) in NEIGHBOR_BUCKETS.items():
+            expected = [
+                index.ids[other] for other in range(len(index))
+                if other != place
+                and distances[other] <= radius_km
+                and index.category[other] in {CATEGORY_CODES[c] for c in categories}
+            ]
+            assert sorted(buckets[bucket]) == sorted(expected)
+
+
+def test_long_lists_are_dropped(city_places, monkeypatch):
+    full = neighbors.compute_neighbors(city_places)
+    monkeypatch.setattr(neighbors, "NEIGHBOR_LIST_MAX", 3)
+    capped = neighbors.compute_neighbors(city_places)
+
+    assert full.keys() == capped.keys()
+    for place_id, lists in capped.items():
+        for bucket, ids in lists.items():
+            if ids is None:
+                assert len(full[place_id][bucket]) > 3
+            else:
+                assert ids == full[place_id][bucket]
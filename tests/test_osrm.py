@@ -0,0 +1,42 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src import osrm
+from src.osrm import fetch_route, route_cache
+
+
+@pytest.fixture
+def osrm_server(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(200, json={"routes": [{
+            "distance": 1200.0,
+            "duration": 300.0,
+            "geometry": {"coordinates": [[85.3, 27.7], [85.31, 27.71]]},
+        }]})
+
+    client = httpx.AsyncClient(base_url="http://osrm", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(osrm.osrm_clients, "get", lambda profile: client)
+    route_cache.clear()
+    yield calls
+    route_cache.clear()
+
+
+def test_nearby_requests_share_a_cached_route(osrm_server):
+    first = asyncio.run(fetch_route("car", 27.700001, 85.300001, 27.71, 85.31))
+    second = asyncio.run(fetch_route("car", 27.700004, 85.299996, 27.71, 85.31))
+
+    assert first == second and first["duration_s"] == 300.0
+    assert osrm_server == ["/route/v1/driving/85.3,27.7;85.31,27.71"]
+    assert route_cache.bytes == osrm._route_size(first)
+
+
+def test_profiles_are_cached_separately(osrm_server):
+    asyncio.run(fetch_route("car", 27.7, 85.3, 27.71, 85.31))
+    asyncio.run(fetch_route("foot", 27.7, 85.3, 27.71, 85.31))
+
+    assert len(osrm_server) == 2
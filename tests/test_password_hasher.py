@@ -0,0 +1,46 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from src.password_hasher import PasswordHasher
+
+
+def test_hash_and_verify():
+    hasher = PasswordHasher(pool_size=1, max_queue=0, rounds=4)
+
+    async def run():
+        hashed = await hasher.hash("secret")
+        return await hasher.verify("secret", hashed), await hasher.verify("guess", hashed)
+
+    assert asyncio.run(run()) == (True, False)
+    assert hasher.stats()["hashes"] == 3
+    hasher.shutdown()
+
+
+def test_rejects_with_503_when_saturated():
+    hasher = PasswordHasher(pool_size=1, max_queue=1, rounds=4)
+    release = threading.Event()
+
+    async def run():
+        # One hash running and one queued fill the pool
+        blocked = [asyncio.ensure_future(hasher._run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        assert hasher.pending == 2
+
+        with pytest.raises(HTTPException) as rejected:
+            await hasher.hash("secret")
+
+        release.set()
+        await asyncio.gather(*blocked)
+        return rejected.value
+
+    rejected = asyncio.run(run())
+    assert rejected.status_code == 503
+    assert rejected.headers == {"Retry-After": "1"}
+    assert hasher.stats()["rejected"] == 1 and hasher.pending == 0
+
+    # Capacity comes back once the pending hashes finish
+    assert asyncio.run(hasher.hash("secret")).startswith("$2")
+    hasher.shutdown()
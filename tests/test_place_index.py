@@ -0,0 +1,74 @@
+from collections import Counter
+
+import numpy as np
+
+from src.models import Mood, MOOD_TO_CATEGORY
+from src.place_index import PlaceIndex, weight_table
+
+
+def _place(place_id, category="cafe", moods=("peaceful",), **fields):
+    return {
+        "id": place_id,
+        "latitude": 27.7,
+        "longitude": 85.3,
+        "category": category,
+        "compatable_moods": list(moods),
+        **fields,
+    }
+
+
+def test_score_matches_per_place_count(city_places):
+    index = PlaceIndex(city_places)
+
+    for moods in ([Mood.food], [Mood.cultural, Mood.nature], [Mood.peaceful, Mood.peaceful, Mood.food]):
+        expected = [
+            sum(
+                place["category"] in MOOD_TO_CATEGORY[mood] and mood in place["compatable_moods"]
+                for mood in moods
+            )
+            for place in index.places
+        ]
+        assert index.score(weight_table(Counter(moods))).tolist() == expected
+
+
+def test_malformed_places_are_skipped():
+    places = [
+        _place(1),
+        _place(2, latitude="north"),
+        {"id": 3, "latitude": 27.7, "longitude": 85.3, "compatable_moods": []},
+        {**_place(4), "compatable_moods": None},
+        _place(5, category=7, moods=["peaceful", 3]),
+    ]
+    index = PlaceIndex(places)
+
+    assert index.ids == [1, 5]
+    assert [place["id"] for place in index.skipped] == [2, 3, 4]
+    assert index.score(weight_table({"peaceful": 1})).tolist() == [0, 0]
+
+
+def test_unparseable_numbers():
+    index = PlaceIndex([
+        _place(1, rating="4.5", avg_price="300"),
+        _place(2, rating="n/a", avg_price="NPR 600"),
+        _place(3, rating=float("nan")),
+        _place(4),
+    ])
+
+    assert index.rating.tolist() == [4.5, 0.0, 0.0, 0.0]
+    assert index.price[0] == 300
+    assert np.isnan(index.price[1:]).all()
+
+
+def test_neighbors_of_concatenates_lists():
+    places = [_place(i) for i in range(1, 5)]
+    lists = {"secondary": [2, 3], "food": [], "accomodations": [4]}
+    index = PlaceIndex(places, {
+        1: lists,
+        2: {**lists, "secondary": [1, 99]},
+        3: {**lists, "food": None},
+    })
+
+    assert index.has_neighbors.tolist() == [True, True, False, False]
+    assert index.neighbors_of(np.array([0, 1]), "secondary").tolist() == [1, 2, 0]
+    assert index.neighbors_of(np.array([1, 0]), "accomodations").tolist() == [3, 3]
+    assert index.neighbors_of(np.array([0, 1]), "food").tolist() == []
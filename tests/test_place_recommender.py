@@ -0,0 +1,238 @@
+import itertools
+import math
+import random
+
+import numpy as np
+import pytest
+
+from src import neighbors
+from src.models import Category, Mood, MOOD_COMPLEMENTARY, MOOD_TO_CATEGORY
+from src.place_index import PlaceIndex
+from src.place_recommender import (
+    generate_batch_recommendations,
+    generate_recommendations,
+    schedule_places,
+)
+
+MOOD_SETS = [
+    *([mood] for mood in Mood),
+    *(list(pair) for pair in itertools.combinations(Mood, 2)),
+    [Mood.cultural, Mood.cultural, Mood.nature],
+    [Mood.food, Mood.peaceful, Mood.adventurous],
+]
+BUDGETS = [500, 5000, 50000]
+DATES = [("2025-12-20", "2025-12-20"), ("2025-12-20", "2025-12-25")]
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _distance(a, b):
+    lat1, lon1 = math.radians(float(a["latitude"])), math.radians(float(a["longitude"]))
+    lat2, lon2 = math.radians(float(b["latitude"])), math.radians(float(b["longitude"]))
+    h = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * 6371 * math.atan2(math.sqrt(h), math.sqrt(1 - h))
+
+
+def reference_recommendations(places, from_date, to_date, moods, budget):
+    # The recommender written out place by place: score every place, keep
+    # the ones near a primary attraction, sort and spend the budget in order
+    trip_days = (np.datetime64(to_date) - np.datetime64(from_date)).astype(int) + 1
+
+    primary = []
+    for place in places:
+        score = sum(
+            place["category"] in MOOD_TO_CATEGORY[mood] and mood in place["compatable_moods"]
+            for mood in moods
+        )
+        if score:
+            primary.append((score, place))
+
+    primary_ids = {place["id"] for _, place in primary}
+    secondary = []
+    for place in places:
+        score = sum(
+            place["category"] in MOOD_TO_CATEGORY[complementary]
+            and complementary in place["compatable_moods"]
+            for mood in moods
+            for complementary in MOOD_COMPLEMENTARY[mood]
+        )
+        if score and place["id"] not in primary_ids:
+            secondary.append((score, place))
+
+    def in_category(category):
+        scored = [
+            (sum(mood in place["compatable_moods"] for mood in moods), place)
+            for place in places
+            if place["category"] == category
+        ]
+        return [(score, place) for score, place in scored if score]
+
+    food = [] if Mood.food in moods else in_category(Category.restaurant)
+    stays = in_category(Category.accomodations)
+
+    def near(scored, radius_km):
+        return [
+            (score, place) for score, place in scored
+            if any(_distance(place, other) <= radius_km for _, other in primary)
+        ]
+
+    def ranked(scored):
+        return sorted(scored, key=lambda x: x[0] + _number(x[1].get("rating", 0)), reverse=True)
+
+    primary = ranked(primary)
+    secondary = ranked(near(secondary, 2.5))
+    food = ranked(near(food, 1.5))
+    stays = [] if trip_days <= 1 else ranked(near(stays, 2.0))
+
+    recommended = dict.fromkeys(("primary", "secondary", "food", "accomodations"), 0)
+    for _, place in stays:
+        price = _number(place["avg_price"]) * (trip_days - 1)
+        if budget * 0.3 >= price:
+            budget -= price
+            recommended["accomodations"] += 1
+            break
+
+    for bucket, scored, share in (("food", food, 0.3), ("primary", primary, 0.3), ("secondary", secondary, 0.1)):
+        allowance = budget * share
+        for _, place in scored:
+            if allowance >= _number(place["avg_price"]):
+                budget -= _number(place["avg_price"])
+                recommended[bucket] += 1
+
+    return {
+        bucket: {"data": [place for _, place in scored], "recommended": recommended[bucket]}
+        for bucket, scored in (
+            ("primary", primary), ("secondary", secondary), ("food", food), ("accomodations", stays)
+        )
+    }
+
+
+def _cases():
+    return itertools.product(MOOD_SETS, BUDGETS, DATES)
+
+
+def test_matches_reference(city_places):
+    for moods, budget, dates in _cases():
+        result = generate_recommendations(city_places, *dates, moods, budget)
+        expected = reference_recommendations(city_places, *dates, moods, budget)
+
+        for bucket, entry in expected.items():
+            assert result[bucket]["data"] == entry["data"], (moods, budget, dates, bucket)
+            assert result[bucket]["recommended"] == entry["recommended"], (moods, budget, dates, bucket)
+            assert result[bucket]["total"] == len(entry["data"])
+
+
+def test_limit_returns_prefix(city_places):
+    index = PlaceIndex(city_places)
+    for moods, budget, dates in _cases():
+        full = generate_recommendations(city_places, *dates, moods, budget, index=index)
+        for limit in (1, 3):
+            top = generate_recommendations(city_places, *dates, moods, budget, index=index, limit=limit)
+            for bucket, entry in full.items():
+                assert top[bucket]["data"] == entry["data"][:limit]
+                assert top[bucket]["recommended"] == entry["recommended"]
+                assert top[bucket]["total"] == entry["total"]
+
+
+def test_compact_view(city_places):
+    index = PlaceIndex(city_places)
+    for moods, budget, dates in _cases():
+        full = generate_recommendations(city_places, *dates, moods, budget, index=index)
+        compact = generate_recommendations(
+            city_places, *dates, moods, budget, index=index, limit=5, view="compact"
+        )
+
+        for bucket, entry in full.items():
+            assert [item["id"] for item in compact[bucket]["data"]] == [
+                place["id"] for place in entry["data"][:5]
+            ]
+            assert all(item["score"] > 0 for item in compact[bucket]["data"])
+            assert compact[bucket]["recommended"] == entry["recommended"]
+
+
+@pytest.mark.parametrize("list_max", [256, 3])
+def test_neighbor_lists_match_distance_checks(city_places, monkeypatch, list_max):
+    monkeypatch.setattr(neighbors, "NEIGHBOR_LIST_MAX", list_max)
+    plain = PlaceIndex(city_places)
+    listed = PlaceIndex(city_places, neighbors.compute_neighbors(city_places))
+    assert listed.has_neighbors.any()
+
+    for moods, budget, dates in _cases():
+        assert generate_recommendations(
+            city_places, *dates, moods, budget, index=listed
+        ) == generate_recommendations(city_places, *dates, moods, budget, index=plain)
+
+
+def test_batch_matches_single_requests(city_places):
+    index = PlaceIndex(city_places)
+    requests = [
+        {"moods": moods, "trip_days": trip_days, "budget": budget, "limit": limit, "view": "full"}
+        for moods, budget, trip_days, limit in itertools.product(
+            MOOD_SETS[:8], BUDGETS, (1, 6), (None, 2)
+        )
+    ]
+
+    for req, result in zip(requests, generate_batch_recommendations(index, requests)):
+        to_date = f"2025-12-{19 + req['trip_days']}"
+        assert result == generate_recommendations(
+            city_places, "2025-12-20", to_date, req["moods"], req["budget"],
+            index=index, limit=req["limit"]
+        )
+
+
+def test_unparseable_rating_ranks_as_unrated():
+    places = [
+        {
+            "id": place_id, "category": "temple", "compatable_moods": ["cultural"],
+            "latitude": 27.7, "longitude": 85.3, "avg_price": 0, "rating": rating,
+        }
+        for place_id, rating in enumerate([3.0, "n/a", 4.5, None, "nan", 0.5], start=1)
+    ]
+    full = generate_recommendations(places, *DATES[0], [Mood.cultural], 1000)["primary"]["data"]
+
+    assert [place["id"] for place in full] == [3, 1, 6, 2, 4, 5]
+    for limit in range(1, len(places) + 1):
+        top = generate_recommendations(places, *DATES[0], [Mood.cultural], 1000, limit=limit)
+        assert top["primary"]["data"] == full[:limit]
+
+
+def test_schedule_spreads_without_dropping():
+    assert schedule_places(list("abcd"), [0b01] * 4, 2) == [["a", "b", "c", "d"], []]
+    assert schedule_places(list("abcd"), [0b11] * 4, 2) == [["a", "c"], ["b", "d"]]
+    assert schedule_places(list("ab"), [0b00, 0b10], 2) == [[], ["b"]]
+
+
+def test_schedule_hard_cap_drops_overflow():
+    assert schedule_places(list("abcd"), [0b01] * 4, 2, max_per_day=2) == [["a", "b"], []]
+
+
+def test_schedule_places_on_suitable_days():
+    rng = random.Random(0)
+    for _ in range(500):
+        trip_days = rng.randint(1, 6)
+        count = rng.randint(0, 15)
+        suitable = [rng.randrange(1 << trip_days) for _ in range(count)]
+        places = list(range(count))
+        max_per_day = rng.choice([None, 1, 2, 3])
+
+        days = schedule_places(places, suitable, trip_days, max_per_day)
+        placed = [place for day in days for place in day]
+
+        assert len(days) == trip_days
+        assert len(placed) == len(set(placed))
+        for day, day_places in enumerate(days):
+            assert day_places == sorted(day_places)
+            assert all(suitable[place] >> day & 1 for place in day_places)
+            if max_per_day is not None:
+                assert len(day_places) <= max_per_day
+
+        if max_per_day is None:
+            assert set(placed) == {place for place in places if suitable[place]}
@@ -0,0 +1,166 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from src.catalog import catalog
+from src.etag import catalog_etag
+from src.place_index import PlaceIndex
+from src.routes import recommend
+from src.routes.recommend import recommendation_cache
+from src.server import app
+
+from conftest import load_city
+
+REQUEST = {
+    "location": "Kathmandu",
+    "from_date": "2025-12-20",
+    "to_date": "2025-12-22",
+    "moods": ["cultural", "food"],
+    "budget": 5000,
+}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # The catalog is stubbed and the lifespan never runs, so Mongo isn't needed
+    monkeypatch.setattr(catalog, "_indexes", {"Kathmandu": PlaceIndex(load_city("kathmandu"))})
+    monkeypatch.setattr(catalog, "version", 7)
+    recommendation_cache.clear()
+    yield TestClient(app)
+    recommendation_cache.clear()
+
+
+def test_recommend_etag_round_trip(client):
+    first = client.post("/places/recommend", json=REQUEST)
+    etag = first.headers["ETag"]
+
+    again = client.post("/places/recommend", json=REQUEST, headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b""
+    assert again.headers["ETag"] == etag
+
+    for header in (f'W/{etag}', f'"other", {etag}', "*"):
+        assert client.post(
+            "/places/recommend", json=REQUEST, headers={"If-None-Match": header}
+        ).status_code == 304
+
+    other = client.post("/places/recommend", json={**REQUEST, "budget": 6000}, headers={"If-None-Match": etag})
+    assert other.status_code == 200 and other.headers["ETag"] != etag
+
+
+def test_catalog_write_changes_etag(client, monkeypatch):
+    etag = client.post("/places/recommend", json=REQUEST).headers["ETag"]
+
+    monkeypatch.setattr(catalog, "version", 8)
+    response = client.post("/places/recommend", json=REQUEST, headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["ETag"] != etag
+
+
+def test_no_etag_before_catalog_version(monkeypatch):
+    monkeypatch.setattr(catalog, "version", None)
+    assert catalog_etag("recommend", REQUEST) is None
+
+
+def test_destinations_not_modified_without_mongo(client):
+    # The 304 is decided before any query; Mongo isn't reachable here
+    etag = catalog_etag("destinations", 10, None, "json")
+
+    response = client.get("/destinations/?limit=10", headers={"If-None-Match": etag})
+    assert response.status_code == 304 and response.headers["ETag"] == etag
+
+
+@pytest.fixture
+def computed(monkeypatch):
+    # Requests that reached the recommender, i.e. cache misses
+    calls = []
+    generate = recommend.generate_recommendations
+
+    def counted(*args, **kwargs):
+        calls.append(args[3])
+        return generate(*args, **kwargs)
+
+    monkeypatch.setattr(recommend, "generate_recommendations", counted)
+    return calls
+
+
+def test_equivalent_requests_share_a_cache_entry(client, computed):
+    first = client.post("/places/recommend", json=REQUEST).json()
+
+    # Same moods in another order or repeated, same trip length on other dates
+    for variant in (
+        {"moods": ["food", "cultural"]},
+        {"moods": ["food", "cultural", "food"]},
+        {"from_date": "2026-01-10", "to_date": "2026-01-12"},
+    ):
+        assert client.post("/places/recommend", json={**REQUEST, **variant}).json() == first
+
+    assert len(computed) == 1
+    assert recommendation_cache.stats()["hits"] == 3
+
+
+def test_cache_key_keeps_what_changes_the_answer(client, computed):
+    for variant in (
+        {},
+        {"budget": 6000},
+        {"to_date": "2025-12-23"},
+        {"limit": 2},
+        {"view": "compact"},
+        {"moods": ["cultural"]},
+    ):
+        client.post("/places/recommend", json={**REQUEST, **variant})
+
+    assert len(computed) == 6
+
+
+def test_catalog_version_is_part_of_the_key(client, computed, monkeypatch):
+    client.post("/places/recommend", json=REQUEST)
+    monkeypatch.setattr(catalog, "version", 8)
+    client.post("/places/recommend", json=REQUEST)
+
+    assert len(computed) == 2
+
+
+def test_purge_recommendation_cache(client, computed):
+    client.post("/places/recommend", json=REQUEST)
+    client.post("/places/recommend", json={**REQUEST, "budget": 1})
+
+    assert client.delete("/admin/recommendation-cache").json() == {"purged": 2}
+    assert len(recommendation_cache) == 0
+
+    client.post("/places/recommend", json=REQUEST)
+    assert len(computed) == 3
+
+
+def test_batch_matches_single_requests(client):
+    requests = [
+        REQUEST,
+        {**REQUEST, "moods": ["nature"], "limit": 2},
+        {**REQUEST, "location": "Nowhere"},
+        {**REQUEST, "view": "compact"},
+        REQUEST,
+    ]
+    batch = client.post("/places/recommend/batch", json={"requests": requests}).json()
+
+    assert batch[2] == {"detail": "Invalid Location"}
+    recommendation_cache.clear()
+    for req, result in zip(requests, batch):
+        if req["location"] == "Kathmandu":
+            assert result == client.post("/places/recommend", json=req).json()
+
+
+def test_batch_size_is_bounded(client, monkeypatch):
+    monkeypatch.setattr(recommend, "RECOMMENDATION_BATCH_MAX_SIZE", 2)
+    response = client.post("/places/recommend/batch", json={"requests": [REQUEST] * 3})
+    assert response.status_code == 400
+
+
+def test_finalize_rejects_cap_with_clusters(client):
+    body = {
+        "primary_attractions": [],
+        "secondary_attractions": [],
+        "food_places": [],
+        "accomodations": [],
+        "from_date": "2025-12-20",
+        "to_date": "2025-12-22",
+        "cluster_days": True,
+        "max_per_day": 2,
+    }
+    assert client.post("/places/finalize", json=body).status_code == 400
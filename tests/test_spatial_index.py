@@ -0,0 +1,38 @@
+import numpy as np
+
+from src.spatial_index import SpatialGrid, haversine_batch
+
+
+def _points(n, seed):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(27.60, 27.80, n), rng.uniform(85.20, 85.45, n)
+
+
+def test_within_matches_brute_force():
+    grid_lats, grid_lons = _points(60, 0)
+    lats, lons = _points(500, 1)
+    distances = haversine_batch(lats[:, None], lons[:, None], grid_lats[None, :], grid_lons[None, :])
+
+    for cell_km in (0.5, 2.0):
+        grid = SpatialGrid(grid_lats, grid_lons, cell_km=cell_km)
+        for radius_km in (0.3, 1.5, 2.5):
+            expected = (distances <= radius_km).any(axis=1)
+            assert np.array_equal(grid.within(lats, lons, radius_km), expected)
+
+
+def test_query_matches_brute_force():
+    grid_lats, grid_lons = _points(200, 2)
+    lats, lons = _points(50, 3)
+    grid = SpatialGrid(grid_lats, grid_lons, cell_km=2.5)
+
+    for i, (ids, distances) in enumerate(grid.query(lats, lons, 2.5)):
+        all_distances = haversine_batch(lats[i], lons[i], grid_lats, grid_lons)
+        expected = np.flatnonzero(all_distances <= 2.5)
+        assert sorted(ids.tolist()) == expected.tolist()
+        assert np.allclose(distances, all_distances[ids])
+
+
+def test_empty_grid_and_queries():
+    grid = SpatialGrid([], [])
+    assert not grid.within([27.7], [85.3], 2.0).any()
+    assert len(SpatialGrid([27.7], [85.3]).within([], [], 2.0)) == 0
@@ -0,0 +1,76 @@
+import asyncio
+import itertools
+import json
+import math
+
+import numpy as np
+
+from src.routes import recommend
+from src.tour import fill_missing_durations, haversine_durations, optimize_order
+
+PLACES = [
+    {"id": 1, "latitude": 27.70, "longitude": 85.30},
+    {"id": 2, "latitude": 27.71, "longitude": 85.31},
+    {"id": 3, "latitude": 27.72, "longitude": 85.30},
+]
+
+
+def test_fill_missing_durations_uses_straight_lines():
+    durations = [[0, 100, None], [100, 0, 50], [None, 50, 0]]
+    filled = fill_missing_durations(durations, PLACES, "foot")
+    straight = haversine_durations(PLACES, "foot")
+
+    assert filled[0, 1] == 100 and filled[1, 2] == 50
+    assert filled[0, 2] == straight[0, 2] and filled[2, 0] == straight[2, 0]
+
+
+def test_order_day_with_unreachable_pairs(monkeypatch):
+    async def fetch_table(profile, points):
+        return {"durations_s": [[0, None, 300], [None, 0, None], [300, None, 0]]}
+
+    monkeypatch.setattr(recommend, "fetch_table", fetch_table)
+    day = {"primary_attraction": PLACES[:2], "secondary_attraction": PLACES[2:]}
+    asyncio.run(recommend.order_day(day, "car"))
+
+    assert sorted(day["visit_order"]) == [1, 2, 3]
+    assert math.isfinite(day["travel_time_s"])
+    json.dumps(day, allow_nan=False)
+
+
+def test_optimize_order_treats_missing_as_unreachable():
+    order, cost = optimize_order([[0, None, 1], [1, 0, None], [None, 1, 0]])
+    assert order == [0, 2, 1] and cost == 2
+
+
+def _cost(durations, order):
+    return sum(durations[a][b] for a, b in zip(order, order[1:]))
+
+
+def test_optimize_order_close_to_brute_force():
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        points = rng.uniform(0, 10, (7, 2))
+        durations = np.hypot(*(points[:, None, :] - points[None, :, :]).transpose(2, 0, 1))
+
+        order, cost = optimize_order(durations.tolist(), time_budget_s=1)
+        best = min(_cost(durations, list(p)) for p in itertools.permutations(range(7)))
+
+        assert sorted(order) == list(range(7))
+        assert math.isclose(cost, _cost(durations, order))
+        assert cost <= best * 1.1
+
+
+def test_optimize_order_follows_asymmetric_times():
+    # Going 0 -> 1 -> 2 is cheap, any other direction is slow
+    durations = [[0, 1, 100], [100, 0, 1], [1, 100, 0]]
+    assert optimize_order(durations) == ([0, 1, 2], 2)
+
+
+def test_optimize_order_without_time_budget():
+    # One nearest-neighbour path is always built
+    durations = haversine_durations(PLACES * 3)
+    order, cost = optimize_order(durations, time_budget_s=0)
+
+    assert sorted(order) == list(range(9)) and math.isfinite(cost)
+    assert optimize_order([[0]]) == ([0], 0.0)
+    assert optimize_order([]) == ([], 0.0)
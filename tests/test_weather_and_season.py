@@ -0,0 +1,169 @@
+import asyncio
+from datetime import date, timedelta
+
+import httpx
+import pytest
+
+from src import weather_and_season
+from src.models import Weather
+from src.weather_and_season import (
+    ARCHIVE_DELAY_DAYS,
+    ARCHIVE_URL,
+    FORECAST_URL,
+    WeatherUnavailable,
+    get_weather_for_places,
+    get_weather_for_range,
+)
+from src.weather_cache import WeatherCache
+
+
+def daily(params, precipitation=0.0):
+    # Open-Meteo's daily response for the requested range
+    start = date.fromisoformat(params["start_date"])
+    end = date.fromisoformat(params["end_date"])
+    days = [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+    return {
+        "daily": {
+            "time": days,
+            "precipitation_sum": [precipitation] * len(days),
+            "cloudcover_mean": [10] * len(days),
+        }
+    }
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    cache = WeatherCache(path=str(tmp_path / "weather.sqlite3"))
+    monkeypatch.setattr(weather_and_season, "weather_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def open_meteo(monkeypatch):
+    calls = []
+    responses = {}
+
+    def get(url, params, timeout):
+        calls.append((url, params["start_date"], params["end_date"]))
+        return FakeResponse(responses.get(url, daily)(params))
+
+    monkeypatch.setattr(weather_and_season.requests, "get", get)
+    return calls, responses
+
+
+def test_range_splits_archive_and_forecast(open_meteo):
+    calls, _ = open_meteo
+    today = date.today()
+    settled = today - timedelta(days=ARCHIVE_DELAY_DAYS)
+    start, end = today - timedelta(days=10), today + timedelta(days=2)
+
+    weather = get_weather_for_range(27.7, 85.3, start.isoformat(), end.isoformat())
+
+    assert len(weather) == 13 and set(weather.values()) == {Weather.sunny}
+    assert calls == [
+        (ARCHIVE_URL, start.isoformat(), (settled - timedelta(days=1)).isoformat()),
+        (FORECAST_URL, settled.isoformat(), end.isoformat()),
+    ]
+
+    # Every day is cached now, archive and forecast alike
+    assert get_weather_for_range(27.7, 85.3, start.isoformat(), end.isoformat()) == weather
+    assert len(calls) == 2
+
+
+def test_only_missing_days_are_fetched(open_meteo):
+    calls, _ = open_meteo
+    today = date.today()
+
+    get_weather_for_range(27.7, 85.3, today.isoformat(), (today + timedelta(days=1)).isoformat())
+    get_weather_for_range(27.7, 85.3, today.isoformat(), (today + timedelta(days=3)).isoformat())
+
+    assert calls[1] == (
+        FORECAST_URL,
+        (today + timedelta(days=2)).isoformat(),
+        (today + timedelta(days=3)).isoformat(),
+    )
+
+
+def test_null_weather_raises(open_meteo, cache):
+    _, responses = open_meteo
+    day = (date.today() + timedelta(days=1)).isoformat()
+
+    def nulls(params):
+        data = daily(params)
+        data["daily"]["precipitation_sum"][-1] = None
+        return data
+
+    responses[FORECAST_URL] = nulls
+    with pytest.raises(WeatherUnavailable):
+        get_weather_for_range(27.7, 85.3, date.today().isoformat(), day)
+
+    responses[FORECAST_URL] = lambda params: {"error": True, "reason": "out of range"}
+    with pytest.raises(WeatherUnavailable):
+        get_weather_for_range(27.7, 85.3, day, day)
+
+    assert cache.get_many(27.7, 85.3, [day], "Asia/Kathmandu") == {}
+
+
+@pytest.fixture
+def async_open_meteo(monkeypatch):
+    calls = []
+    in_flight = [0, 0]
+
+    async def handler(request):
+        params = dict(request.url.params)
+        calls.append((params["latitude"], params["longitude"]))
+        in_flight[0] += 1
+        in_flight[1] = max(in_flight[1], in_flight[0])
+        await asyncio.sleep(0.01)
+        in_flight[0] -= 1
+        return httpx.Response(200, json=daily(params))
+
+    client = httpx.AsyncClient
+    monkeypatch.setattr(
+        weather_and_season.httpx,
+        "AsyncClient",
+        lambda **kwargs: client(transport=httpx.MockTransport(handler), **kwargs),
+    )
+    return calls, in_flight
+
+
+def test_places_in_a_cell_share_one_fetch(async_open_meteo, cache):
+    calls, _ = async_open_meteo
+    day = (date.today() + timedelta(days=1)).isoformat()
+    places = [
+        {"latitude": 27.701, "longitude": 85.301},
+        {"latitude": 27.709, "longitude": 85.309},
+        {"latitude": "27.702", "longitude": "85.302"},
+        {"latitude": 27.80, "longitude": 85.30},
+    ]
+
+    weather = asyncio.run(get_weather_for_places(places, day, day))
+
+    assert set(weather) == {(27.7, 85.3), (27.8, 85.3)}
+    assert sorted(calls) == [("27.7", "85.3"), ("27.8", "85.3")]
+    assert weather[cache.snap(27.709, 85.309)] == {day: Weather.sunny}
+
+    asyncio.run(get_weather_for_places(places, day, day))
+    assert len(calls) == 2
+
+
+def test_fetches_are_bounded(async_open_meteo):
+    calls, in_flight = async_open_meteo
+    day = (date.today() + timedelta(days=1)).isoformat()
+    places = [{"latitude": 27.0 + i * 0.1, "longitude": 85.3} for i in range(10)]
+
+    weather = asyncio.run(get_weather_for_places(places, day, day, concurrency=3))
+
+    assert len(weather) == len(calls) == 10
+    assert in_flight[1] == 3
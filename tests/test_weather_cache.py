@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+from src.models import Weather
+from src.weather_cache import WeatherCache
+
+TZ = "Asia/Kathmandu"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+def test_memory_then_disk_tier(tmp_path, clock):
+    path = str(tmp_path / "weather.sqlite3")
+    cache = WeatherCache(path=path, forecast_ttl=3600)
+    cache.set_many(27.7, 85.3, TZ, [
+        ("2025-12-20", Weather.sunny, True),
+        ("2025-12-21", Weather.rainy, False),
+    ])
+
+    days = ["2025-12-20", "2025-12-21", "2025-12-22"]
+    expected = {"2025-12-20": Weather.sunny, "2025-12-21": Weather.rainy}
+    assert cache.get_many(27.7, 85.3, days, TZ) == expected
+    assert cache.stats()["memory_hits"] == 2 and cache.stats()["misses"] == 1
+
+    # A new process only has the disk tier, which then fills memory again
+    restarted = WeatherCache(path=path, forecast_ttl=3600)
+    assert restarted.get_many(27.7, 85.3, days, TZ) == expected
+    assert restarted.get_many(27.7, 85.3, days, TZ) == expected
+
+    stats = restarted.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (2, 2, 2)
+
+
+def test_forecasts_expire_archive_does_not(tmp_path, clock):
+    path = str(tmp_path / "weather.sqlite3")
+    cache = WeatherCache(path=path, forecast_ttl=3600)
+    cache.set_many(27.7, 85.3, TZ, [
+        ("2025-12-20", Weather.sunny, True),
+        ("2025-12-21", Weather.rainy, False),
+    ])
+
+    clock[0] += 3601
+    days = ["2025-12-20", "2025-12-21"]
+    assert cache.get_many(27.7, 85.3, days, TZ) == {"2025-12-20": Weather.sunny}
+    assert WeatherCache(path=path).get_many(27.7, 85.3, days, TZ) == {"2025-12-20": Weather.sunny}
+
+
+def test_nearby_points_share_a_cell(tmp_path):
+    cache = WeatherCache(path=str(tmp_path / "weather.sqlite3"), grid=0.05)
+    cache.set_many(27.701, 85.302, TZ, [("2025-12-20", Weather.cloudy, True)])
+
+    assert cache.snap(27.701, 85.302) == cache.snap(27.71, 85.31) == (27.7, 85.3)
+    assert cache.get_many(27.71, 85.31, ["2025-12-20"], TZ) == {"2025-12-20": Weather.cloudy}
+    assert cache.get_many(27.80, 85.31, ["2025-12-20"], TZ) == {}
+    assert cache.get_many(27.71, 85.31, ["2025-12-20"], "UTC") == {}